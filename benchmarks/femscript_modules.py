@@ -0,0 +1,142 @@
+"""
+Copyright 2022-2025 PoligonTeam
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from femscript import Femscript, AST
+from stdlib import MODULES_PATH, NATIVE_MODULES, NativeModule
+
+import asyncio, argparse, time, sys
+
+from typing import Optional, Any
+
+CALLS = {
+    "math": {
+        "floor": "math.floor(12.75)",
+        "round": "math.round(12.75)",
+        "randint": "math.randint(0, 100)",
+        "random_choice": "math.random_choice(items)",
+        "_5050": "math._5050()"
+    }
+}
+
+CHECKS = {
+    "math": [
+        "math.floor(12.75)",
+        "math.floor(-12.75)",
+        "math.floor(-0.25)",
+        "math.round(12.75)",
+        "math.round(12.25)",
+        "math.round(-12.75)",
+        "math.round(-12.25)",
+        "math.round(-0.5)"
+    ]
+}
+
+RANDOM_CHECKS = {
+    "math": [
+        "math.randint(-10, 0)",
+        "math.randint(-5, 5)",
+        "math.randint(0, 10)"
+    ]
+}
+
+RANDOM_SAMPLES = 500
+
+def parse(source: str, call: str, calls: int) -> list[AST]:
+    return Femscript(source + "\n\n" + ";\n".join([call] * calls) + ";").ast
+
+async def measure(ast: list[AST], module: Optional[NativeModule], iterations: int) -> float:
+    before = time.perf_counter()
+
+    for _ in range(iterations):
+        femscript = Femscript(variables = [
+            {
+                "name": "items",
+                "value": Femscript.to_fs(["a", "b", "c", "d"])
+            }
+        ])
+
+        femscript.ast = ast
+
+        if module is not None:
+            module.wrap(femscript)
+
+        await femscript.execute()
+
+    return time.perf_counter() - before
+
+async def evaluate(source: str, call: str, module: Optional[NativeModule]) -> Any:
+    femscript = Femscript(source + "\n\nreturn " + call + ";")
+
+    if module is not None:
+        module.wrap(femscript)
+
+    return await femscript.execute()
+
+async def check(name: str, interpreted_source: str, native_source: str) -> bool:
+    module = NATIVE_MODULES[name]
+    passed = True
+
+    for call in CHECKS.get(name, ()):
+        interpreted = await evaluate(interpreted_source, call, None)
+        native = await evaluate(native_source, call, module)
+
+        if interpreted != native:
+            print(f"{call}: interpreted {interpreted!r}, native {native!r}")
+            passed = False
+
+    for call in RANDOM_CHECKS.get(name, ()):
+        interpreted = {await evaluate(interpreted_source, call, None) for _ in range(RANDOM_SAMPLES)}
+        native = {await evaluate(native_source, call, module) for _ in range(RANDOM_SAMPLES)}
+
+        if interpreted != native:
+            print(f"{call}: interpreted {sorted(interpreted)!r}, native {sorted(native)!r}")
+            passed = False
+
+    return passed
+
+async def run(modules: list[str], calls: int, iterations: int) -> None:
+    for name in modules:
+        module = NATIVE_MODULES[name]
+
+        with open(MODULES_PATH + "/" + name + ".fem", "r") as file:
+            interpreted_source = file.read()
+
+        native_source = module.source()
+
+        if not await check(name, interpreted_source, native_source):
+            sys.exit("%s: native module does not match the interpreted one" % name)
+
+        for function, call in CALLS[name].items():
+            interpreted = await measure(parse(interpreted_source, call, calls), None, iterations) - await measure(parse(interpreted_source, call, 1), None, iterations)
+            native = await measure(parse(native_source, call, calls), module, iterations) - await measure(parse(native_source, call, 1), module, iterations)
+
+            interpreted /= iterations * (calls - 1)
+            native /= iterations * (calls - 1)
+
+            print(f"{name}.{function}: interpreted {interpreted * 1e6:.2f}us, native {native * 1e6:.2f}us ({interpreted / native:.2f}x)")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="compares the per call cost of interpreted femscript modules with their native implementations")
+    parser.add_argument("modules", nargs="*", default=list(NATIVE_MODULES))
+    parser.add_argument("--calls", "-c", type=int, default=101)
+    parser.add_argument("--iterations", "-i", type=int, default=200)
+
+    args = parser.parse_args()
+
+    asyncio.run(run(args.modules, args.calls, args.iterations))
+
+if __name__ == "__main__":
+    main()
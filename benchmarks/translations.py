@@ -0,0 +1,76 @@
+"""
+Copyright 2022-2025 PoligonTeam
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import femcord.femcord as femcord
+from femscript import Femscript, AST
+from translation import Translation, load_translations, build_call
+
+import asyncio, argparse, time
+
+from typing import Any
+
+async def legacy_translation(ast: AST, name: str, args: tuple[Any, ...]) -> Any:
+    femscript = Femscript(variables = [
+        {
+            "name": "arg%d" % index,
+            "value": Femscript.to_fs(value)
+        }
+        for index, value in enumerate(args)
+    ])
+
+    femscript.ast = [ast, build_call(name, len(args))]
+    femscript.wrap_function(femcord.Embed)
+
+    return await femscript.execute()
+
+async def measure(func, iterations: int) -> float:
+    before = time.perf_counter()
+
+    for _ in range(iterations):
+        await func()
+
+    return (time.perf_counter() - before) / iterations
+
+async def run(cogs: list[str], iterations: int) -> None:
+    for cog in cogs:
+        legacy_total = prebuilt_total = 0
+
+        for translation in load_translations(cog)["en"].values():
+            translation: Translation
+            argc, _ = next(iter(translation.templates.items()))
+            args = tuple("arg" for _ in range(argc))
+
+            legacy = await measure(lambda: legacy_translation(translation.ast, translation.name, args), iterations)
+            prebuilt = await measure(lambda: translation(*args), iterations)
+
+            legacy_total += legacy
+            prebuilt_total += prebuilt
+
+            print(f"{cog}.{translation.name}: legacy {legacy * 1e6:.1f}us, prebuilt {prebuilt * 1e6:.1f}us ({legacy / prebuilt:.2f}x)")
+
+        print(f"{cog}: legacy {legacy_total * 1e3:.2f}ms, prebuilt {prebuilt_total * 1e3:.2f}ms ({legacy_total / prebuilt_total:.2f}x)\n")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="compares rebuilding translation asts per call with prebuilt templates")
+    parser.add_argument("cogs", nargs="*", default=["fun", "mod"])
+    parser.add_argument("--iterations", "-i", type=int, default=1000)
+
+    args = parser.parse_args()
+
+    asyncio.run(run(args.cogs, args.iterations))
+
+if __name__ == "__main__":
+    main()
@@ -18,11 +18,18 @@ import femcord.femcord as femcord
 from femcord.femcord import commands, types
 from femcord.femcord.http import Route
 from femcord.femcord.permissions import Permissions
-from femscript import Femscript, var, AST, FemscriptModules, FemscriptModule
+from femscript import Femscript, var, AST, FemscriptModules
 from tortoise import Tortoise
-from utils import request
+from utils import request, refresh_artist_images, http_client, set_translation_context
 from lokiclient import LokiClient
-from models import Guilds
+from cache import GuildSettingsCache, ScriptCache
+from catalog import Catalog, CogTranslations
+from sandbox import FemscriptPool
+from profiler import FemscriptProfiler, ProfiledFemscript
+from registry import CommandRegistry
+from storage import StorageBuffer
+from migrations import migrate
+from database import instrument, metrics
 from scheduler.scheduler import Scheduler
 from ipc import IPC
 from poligonlgbt import Poligon
@@ -30,9 +37,11 @@ from datetime import datetime
 
 import asyncio
 import uvloop
+import stdlib
 import random
 import psutil
 import os
+import re
 import time
 import config
 import logging
@@ -41,6 +50,10 @@ from typing import Callable, Awaitable, Optional, Any, Unpack, TypedDict, NotReq
 
 asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 
+PRESENCE_SCRIPT = "presence.fem"
+MENTION_PREFIXES = ("<@{}>", "<@!{}>", "<@{}> ", "<@!{}> ")
+PRESENCE_REQUEST_INTERVAL = 60 * 30
+
 class PaginatorKwargs(TypedDict):
     pages: NotRequired[list]
     by_lines: NotRequired[bool]
@@ -58,78 +71,9 @@ class HybridContext:
         if not hasattr(self.command.cog, "translations"):
             raise Exception(f"cog {self.command.cog.name} has no translations")
 
-        if self.guild and not hasattr(self.guild, "language"):
-            db_guild = await Guilds.filter(guild_id=self.guild.id).first()
-
-            self.guild.prefix = db_guild.prefix
-            self.guild.language = db_guild.language
-            self.guild.welcome_message = db_guild.welcome_message
-            self.guild.leave_message = db_guild.leave_message
-            self.guild.autorole = db_guild.autorole
+        language = self.bot.guild_settings.get(self.guild.id).language if self.guild else "en"
 
-        femscript = Femscript(variables = [
-            {
-                "name": "arg%d" % index,
-                "value": Femscript.to_fs(value)
-            }
-            for index, value in enumerate(args or [])
-        ])
-
-        femscript.ast = [
-            self.command.cog.translations[self.guild.language if self.guild else "en"][translation],
-            {
-                "type": "Keyword",
-                "token": {
-                    "type": "Return",
-                    "value": "",
-                    "number": 0.0,
-                    "list": [],
-                    "bytes": b""
-                },
-                "children": [
-                    {
-                        "type": "Token",
-                        "token": {
-                            "type": "Var",
-                            "value": translation,
-                            "number": 0.0,
-                            "list": [],
-                            "bytes": b""
-                        },
-                        "children": [
-                            {
-                                "type": "Token",
-                                "token": {
-                                    "type": "List",
-                                    "value": "",
-                                    "number": 0.0,
-                                    "list": [],
-                                    "bytes": b""
-                                },
-                                "children": [
-                                    {
-                                        "type": "Token",
-                                        "token": {
-                                            "type": "Var",
-                                            "value": "arg%d" % index,
-                                            "number": 0.0,
-                                            "list": [],
-                                            "bytes": b""
-                                        },
-                                        "children": []
-                                    }
-                                    for index in range(len(args or []))
-                                ]
-                            }
-                        ]
-                    }
-                ]
-            }
-        ]
-
-        femscript.wrap_function(femcord.Embed)
-
-        return await femscript.execute()
+        return await self.command.cog.translations[language][translation](*(args or ()))
 
     async def send_translation(self, translation: str, format_args: tuple[Any, ...] = None, *args, **kwargs) -> types.Message:
         result = await self.get_translation(translation, format_args)
@@ -298,6 +242,7 @@ class HybridContext:
 class Context(HybridContext, commands.Context):
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
+        set_translation_context(self)
 
     def send_paginator(self, content: Optional[str] = None, **kwargs: Unpack[PaginatorKwargs]) -> Awaitable[None]:
         return self.paginator(self.send, lambda interaction, message: interaction.user.id == self.author.id and interaction.channel.id == self.channel.id and interaction.message.id == message.id, content, **kwargs)
@@ -308,6 +253,7 @@ class Context(HybridContext, commands.Context):
 class AppContext(HybridContext, commands.AppContext):
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
+        set_translation_context(self)
 
     def send_paginator(self, content: Optional[str] = None, **kwargs: Unpack[PaginatorKwargs]) -> Awaitable[None]:
         return self.paginator(self.send, lambda interaction, _: interaction.user.id == self.author.id and interaction.channel.id == self.channel.id and interaction.message is not None and interaction.message.interaction_metadata.id == self.interaction.id, content, **kwargs)
@@ -317,6 +263,8 @@ class AppContext(HybridContext, commands.AppContext):
 
 class Bot(commands.Bot):
     def __init__(self, *, start_time: float = time.time()) -> None:
+        self.command_registry = CommandRegistry(self)
+
         super().__init__(name="fembot", command_prefix=self.get_prefix, intents=femcord.Intents().all(), mobile=True, owners=config.OWNERS, context=Context, app_context=AppContext)
 
         self.start_time = start_time
@@ -327,6 +275,10 @@ class Bot(commands.Bot):
         self.random_presence: bool = False
         self.presence_index: int = 0
         self.presence_indexes: list[int] = []
+        self.presence_schedule_interval: int = None
+        self.presence_script: list[AST] = None
+        self.presence_mtime: int = None
+        self.presence_requests: dict[tuple[str, str, str], tuple[float, Any]] = {}
         self.scheduler = Scheduler()
         self.ipc = IPC(self, config.FEMBOT_SOCKET_PATH, [config.DASHBOARD_SOCKET_PATH,])
         self.loki = LokiClient(config.LOKI_BASE_URL, self.scheduler)
@@ -354,8 +306,29 @@ class Bot(commands.Bot):
             created_at = datetime.now()
         )
 
-        self.translations = {}
+        self.guild_settings = GuildSettingsCache()
+        self.mention_prefixes: tuple[str, ...] = ()
+        self.mention_pattern: Optional[re.Pattern] = None
+        self.storage = StorageBuffer(self.loop, flush_interval=config.STORAGE_FLUSH_INTERVAL, max_writes=config.STORAGE_FLUSH_WRITES)
+
+        self.translations = Catalog()
         self.femscript_modules = FemscriptModules()
+        self.scripts = ScriptCache(config.SCRIPT_CACHE_PATH, config.SCRIPT_CACHE_SIZE)
+        self.femscript_pool: Optional[FemscriptPool] = None
+        self.profiler = FemscriptProfiler(config.FEMSCRIPT_PROFILER_HISTORY)
+
+        if config.FEMSCRIPT_WORKERS:
+            self.femscript_pool = FemscriptPool(
+                self.loop,
+                config.FEMSCRIPT_WORKERS,
+                timeout = config.FEMSCRIPT_TIMEOUT,
+                guild_concurrency = config.FEMSCRIPT_GUILD_CONCURRENCY,
+                guild_cpu_budget = config.FEMSCRIPT_GUILD_CPU_BUDGET,
+                budget_window = config.FEMSCRIPT_BUDGET_WINDOW,
+                native_modules = config.FEMSCRIPT_NATIVE_MODULES,
+                script_cache_path = config.SCRIPT_CACHE_PATH,
+                script_cache_size = config.SCRIPT_CACHE_SIZE
+            )
 
         self.loop.create_task(self.async_init())
 
@@ -365,69 +338,29 @@ class Bot(commands.Bot):
 
                 print("loaded %s" % filename)
 
-        for filename in os.listdir("./cogs/translations"):
-            if not filename.endswith(".toml"):
-                continue
-
-            with open("./cogs/translations/" + filename, "r") as f:
-                lang = ""
-
-                for line in f:
-                    if line[0] == "[":
-                        lang = line[1:-2]
-                        if lang not in self.translations:
-                            self.translations[lang] = {}
-                        continue
-                    if line[0] == "\"":
-                        key, value = line.split(" = ", 1)
-                        self.translations[lang][int(key[1:-1], 16)] = value[1:-2].replace("\\n", "\n")
-
-        for filename in os.listdir("./femscript_modules"):
-            if filename[-4:] == ".fem":
-                with open("./femscript_modules/" + filename, "r") as f:
-                    self.femscript_modules.add_module(FemscriptModule(filename[:-4], f.read()))
+        self.native_modules = stdlib.load_modules(self.femscript_modules, native=config.FEMSCRIPT_NATIVE_MODULES)
 
         self.event(self.on_reconnect)
         self.event(self.on_ready)
         self.event(self.on_close)
 
     async def on_reconnect(self) -> None:
-        for guild in self.gateway.guilds:
-            db_guild = await Guilds.filter(guild_id=guild.id).first()
-
-            if db_guild is None:
-                db_guild = await Guilds.create(
-                    guild_id = guild.id,
-                    prefix = config.PREFIX,
-                    welcome_message = "",
-                    leave_message = "",
-                    autorole = "",
-                    custom_commands = [],
-                    database = {},
-                    permissions = {},
-                    schedules = [],
-                    language = "en",
-                    verification_role = "",
-                    verification_message = "",
-                    verification_channel = "",
-                    eventhandlers = {},
-                    interaction_callbacks = {}
-                )
-
-            guild.prefix = db_guild.prefix
-            guild.language = db_guild.language
-            guild.welcome_message = db_guild.welcome_message
-            guild.leave_message = db_guild.leave_message
-            guild.autorole = db_guild.autorole
-            guild.interaction_callbacks = db_guild.interaction_callbacks
+        stats = await self.guild_settings.bootstrap(guild.id for guild in self.gateway.guilds)
+
+        print(f"hydrated guild settings: {stats}")
 
     async def on_ready(self) -> None:
+        self.mention_prefixes = tuple(prefix.format(self.gateway.bot_user.id) for prefix in MENTION_PREFIXES)
+        self.mention_pattern = re.compile(r"<@!?%s> ?" % self.gateway.bot_user.id)
+        self.guild_settings.set_mention_prefixes(self.mention_prefixes)
+
         await self.on_reconnect()
 
         await self.scheduler.create_schedule(self.update_presences, "10m", name="update_presences")()
         await self.scheduler.create_schedule(self.update_user_install_count, "1h", name="update_user_install_count")()
 
         self.scheduler.create_schedule(self.loki.send, "5m", name="loki")
+        self.scheduler.create_schedule(refresh_artist_images, "1h", name="refresh_artist_images")
 
         self.add_entry_point(name="korrumz the game")
         await self.register_app_commands()
@@ -437,6 +370,12 @@ class Bot(commands.Bot):
         print(f"logged in {self.gateway.bot_user.username} ({time.time() - self.start_time:.2f}s)")
 
     async def on_close(self) -> None:
+        await self.storage.close()
+        await http_client.close()
+
+        if self.femscript_pool is not None:
+            self.femscript_pool.close()
+
         await Tortoise.close_connections()
         self.ipc.close()
         await self.loki.send()
@@ -447,10 +386,19 @@ class Bot(commands.Bot):
         logging.getLogger("tortoise").setLevel(logging.WARNING)
 
         await Tortoise.init(config=config.DB_CONFIG, modules={"models": ["app.models"]})
+        instrument()
         await Tortoise.generate_schemas()
 
         print("connected to database")
 
+        if applied := await migrate():
+            print("applied migrations: " + ", ".join(applied))
+
+        if self.femscript_pool is not None:
+            self.femscript_pool.start()
+
+            print(f"started {self.femscript_pool.processes} femscript workers")
+
         self.poligon = await Poligon(config.POLIGON_LGBT_API_KEY, config.POLIGON_LGBT_UPLOAD_KEY)
 
         print("created poligon.lgbt client")
@@ -491,47 +439,91 @@ class Bot(commands.Bot):
             },
             "cpu": psutil.cpu_percent(),
             "latencies": latency_data,
+            "database": metrics.snapshot(),
             "timestamp": self.started_at.timestamp(),
             "last_update": time.time()
         }
 
+    def load_presence_script(self) -> list[AST]:
+        mtime = os.stat(PRESENCE_SCRIPT).st_mtime_ns
+
+        if self.presence_script is None or mtime != self.presence_mtime:
+            with open(PRESENCE_SCRIPT, "r") as file:
+                self.presence_script = self.scripts.parse(file.read())
+
+            self.presence_mtime = mtime
+
+        return self.presence_script
+
+    async def presence_request(self, method: str, url: str, **kwargs) -> Any:
+        key = method, url, repr(kwargs)
+        cached = self.presence_requests.get(key)
+
+        if cached is not None and time.monotonic() - cached[0] < PRESENCE_REQUEST_INTERVAL:
+            return cached[1]
+
+        try:
+            result = await request(method, url, **kwargs)
+        except Exception:
+            if cached is None:
+                raise
+            return cached[1]
+
+        self.presence_requests[key] = time.monotonic(), result
+
+        return result
+
     async def update_presences(self) -> None:
-        with open("presence.fem", "r") as file:
-            code = file.read()
+        presences = []
+
+        femscript = Femscript(variables = [
+            var("guilds", str(len(self.gateway.guilds))),
+            var("users", str(len(self.gateway.users))),
+            var("StatusTypes", variables = [
+                var(status_type.name, status_type) for status_type in femcord.StatusTypes
+            ]),
+            var("ActivityTypes", variables = [
+                var(status_type.name, status_type) for status_type in femcord.ActivityTypes
+            ])
+        ], modules = self.femscript_modules)
+
+        before = time.perf_counter()
+        femscript.ast = self.load_presence_script()
+        stdlib.wrap_native_modules(femscript, self.native_modules)
 
-            self.presences = []
+        femscript = self.profiler.profile(femscript, guild_id=self.gateway.bot_user.id, script="presence", parse_time=time.perf_counter() - before)
 
-            femscript = Femscript(code, variables = [
-                var("guilds", str(len(self.gateway.guilds))),
-                var("users", str(len(self.gateway.users))),
-                var("StatusTypes", variables = [
-                    var(status_type.name, status_type) for status_type in femcord.StatusTypes
-                ]),
-                var("ActivityTypes", variables = [
-                    var(status_type.name, status_type) for status_type in femcord.ActivityTypes
-                ])
-            ], modules = self.femscript_modules)
+        @femscript.wrap_function()
+        def set_update_interval(interval: str | int):
+            self.presence_update_interval = interval
 
-            @femscript.wrap_function()
-            def set_update_interval(interval: str | int):
-                self.presence_update_interval = interval
+        @femscript.wrap_function()
+        def set_random_presence(value: bool):
+            self.random_presence = value
 
-            @femscript.wrap_function()
-            def set_random_presence(value: bool):
-                self.random_presence = value
+        @femscript.wrap_function()
+        def add_presence(*, name: str = None, status_type: femcord.StatusTypes = femcord.StatusTypes.ONLINE, activity_type: femcord.ActivityTypes = femcord.ActivityTypes.PLAYING):
+            presences.append(femcord.Presence(self, status_type, activities=[femcord.Activity(self, name, activity_type)]))
 
-            @femscript.wrap_function()
-            def add_presence(*, name: str = None, status_type: femcord.StatusTypes = femcord.StatusTypes.ONLINE, activity_type: femcord.ActivityTypes = femcord.ActivityTypes.PLAYING):
-                self.presences.append(femcord.Presence(self, status_type, activities=[femcord.Activity(self, name, activity_type)]))
+        femscript.wrap_function(self.presence_request, func_name="request")
 
-            femscript.wrap_function(request)
+        await femscript.execute(debug=True)
 
-            await femscript.execute(debug=True)
+        self.presences = presences
+        self.presence_indexes = [index for index in self.presence_indexes if index < len(presences)]
 
-        if not (schedules := self.scheduler.get_schedules("update_presence")):
-            return await self.scheduler.create_schedule(self.update_presence, self.presence_update_interval, name="update_presence")()
+        if self.presence_index >= len(presences):
+            self.presence_index = 0
 
-        self.scheduler.cancel_schedules(schedules)
+        schedules = self.scheduler.get_schedules("update_presence")
+
+        if schedules and self.presence_update_interval == self.presence_schedule_interval:
+            return
+
+        if schedules:
+            self.scheduler.cancel_schedules(schedules)
+
+        self.presence_schedule_interval = self.presence_update_interval
         await self.scheduler.create_schedule(self.update_presence, self.presence_update_interval, name="update_presence")()
 
     async def update_presence(self) -> None:
@@ -559,37 +551,60 @@ class Bot(commands.Bot):
         data = await self.http.request(Route("GET", "applications", "@me"))
         self.user_install_count = data["approximate_user_install_count"]
 
-    async def get_prefix(self, _, message: femcord.types.Message) -> list[str]:
-        prefixes = ["<@{}>", "<@!{}>", "<@{}> ", "<@!{}> "]
-        prefixes = [prefix.format(self.gateway.bot_user.id) for prefix in prefixes]
+    def get_command(self, name: str, guild_id: Optional[str] = None) -> Optional[commands.Command]:
+        return self.command_registry.get(name, guild_id)
+
+    def add_command(self, command: commands.Command) -> None:
+        super().add_command(command)
+        self.command_registry.add(command)
+
+    def remove_command(self, command: commands.Command) -> None:
+        super().remove_command(command)
+        self.command_registry.remove(command)
 
+    def load_cog(self, *args, **kwargs) -> None:
+        super().load_cog(*args, **kwargs)
+        self.command_registry.invalidate()
+
+    def load_extension(self, *args, **kwargs) -> None:
+        super().load_extension(*args, **kwargs)
+        self.command_registry.invalidate()
+
+    def unload_extension(self, *args, **kwargs) -> None:
+        super().unload_extension(*args, **kwargs)
+        self.command_registry.invalidate()
+
+    def get_prefixes(self, message: femcord.types.Message) -> tuple[str, ...]:
         if not message.guild:
-            return prefixes
+            return self.mention_prefixes
 
-        if hasattr(message.guild, "prefix"):
-            return prefixes + [message.guild.prefix or config.PREFIX]
+        return self.guild_settings.get_prefixes(message.guild.id)
 
-        db_guild = await Guilds.filter(guild_id=message.guild.id).first()
-        message.guild.prefix = db_guild.prefix
+    async def get_prefix(self, _, message: femcord.types.Message) -> tuple[str, ...]:
+        return self.get_prefixes(message)
 
-        return prefixes + [message.guild.prefix or config.PREFIX]
+    def match_prefix(self, message: femcord.types.Message) -> Optional[tuple[str, str]]:
+        if self.mention_pattern is not None and (match := self.mention_pattern.match(message.content)) is not None:
+            return match.group(), message.content[match.end():]
 
-    def get_translations_for(self, name: str) -> dict[str, dict[str, AST]]:
-        translations = {}
+        if message.guild:
+            prefix = self.guild_settings.get_prefixes(message.guild.id)[-1]
 
-        for lang in os.listdir("./cogs/translations/" + name):
-            lang, extension = lang.split(".")
-            translations[lang] = {}
+            if message.content.startswith(prefix):
+                return prefix, message.content[len(prefix):]
 
-            with open("./cogs/translations/" + name + "/" + lang + "." + extension) as file:
-                content = file.read()
+    def create_femscript(self, code: str, *, variables: list[dict[str, Any]], guild_id: str, script: str, ast: Optional[list[AST]] = None) -> ProfiledFemscript:
+        if self.femscript_pool is not None:
+            return self.profiler.profile(self.femscript_pool.compile(code, variables=variables, guild_id=guild_id, ast=ast), guild_id=guild_id, script=script)
 
-            femscript = Femscript(content)
+        before = time.perf_counter()
+        femscript = self.scripts.compile(code, variables=variables, modules=self.femscript_modules, ast=ast)
+        stdlib.wrap_native_modules(femscript, self.native_modules)
 
-            for ast in femscript.ast:
-                translations[lang][ast["children"][0]["token"]["value"]] = ast
+        return self.profiler.profile(femscript, guild_id=guild_id, script=script, parse_time=time.perf_counter() - before)
 
-        return translations
+    def get_translations_for(self, name: str) -> CogTranslations:
+        return self.translations.scripts(name)
 
 if __name__ == "__main__":
     Bot().run(config.TOKEN)
\ No newline at end of file
@@ -0,0 +1,388 @@
+"""
+Copyright 2022-2025 PoligonTeam
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from femscript import Femscript, FemscriptModules, AST
+from models import Guilds
+from dataclasses import dataclass, field, fields
+from collections import OrderedDict
+import config
+import femscript
+
+import hashlib, pickle, time, os, re
+
+from typing import Any, Optional, Iterable, Iterator
+
+BOOTSTRAP_CHUNK_SIZE = 1000
+
+MISSING = object()
+
+class LRUCache:
+    def __init__(self, maxsize: int, ttl: Optional[float] = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.items: OrderedDict[Any, Any] = OrderedDict()
+        self.expires: dict[Any, float] = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self.items and not self.expired(key)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def expired(self, key: Any) -> bool:
+        if self.ttl is None or self.expires[key] > time.monotonic():
+            return False
+
+        self.pop(key)
+
+        return True
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        if key not in self.items or self.expired(key):
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        self.items.move_to_end(key)
+
+        return self.items[key]
+
+    def set(self, key: Any, value: Any, ttl: Optional[float] = None) -> Any:
+        self.items[key] = value
+        self.items.move_to_end(key)
+
+        if self.ttl is not None:
+            self.expires[key] = time.monotonic() + (ttl or self.ttl)
+
+        while len(self.items) > self.maxsize:
+            self.pop(next(iter(self.items)))
+
+        return value
+
+    def pop(self, key: Any, default: Any = None) -> Any:
+        self.expires.pop(key, None)
+        return self.items.pop(key, default)
+
+    def clear(self) -> None:
+        self.items.clear()
+        self.expires.clear()
+
+SCRIPT_CACHE_VERSION = getattr(femscript, "__version__", None) or str(os.path.getmtime(femscript.__file__))
+SCRIPT_CACHE_MAX_AGE = 60 * 60 * 24 * 30
+
+PLACEHOLDER_PATTERN = re.compile(r"\{\s*&?([A-Za-z_][\w.]*)")
+
+def collect_references(ast: list[AST]) -> frozenset[str]:
+    references = set()
+    stack = list(ast)
+
+    while stack:
+        node = stack.pop()
+        token = node.get("token") or {}
+
+        if isinstance(value := token.get("value"), str) and value:
+            if token.get("type") == "Var":
+                references.add(value.lstrip("&"))
+            elif "{" in value:
+                references.update(PLACEHOLDER_PATTERN.findall(value))
+
+        stack.extend(node.get("children") or ())
+        stack.extend({"token": item} for item in token.get("list") or () if isinstance(item, dict))
+
+    return frozenset(references)
+
+def root_references(references: frozenset[str]) -> set[str]:
+    return {reference.split(".", 1)[0] for reference in references}
+
+def select_attributes(references: Optional[frozenset[str]], name: str) -> Optional[set[str]] | bool:
+    if references is None or name in references:
+        return None
+
+    prefix = name + "."
+    attributes = {reference[len(prefix):].split(".", 1)[0] for reference in references if reference.startswith(prefix)}
+
+    return attributes or False
+
+class ScriptCache:
+    def __init__(self, path: Optional[str] = None, max_bytes: int = 32 * 1024 * 1024) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+
+        self.scripts: OrderedDict[str, tuple[list[AST], int]] = OrderedDict()
+        self.size = 0
+        self.references = LRUCache(4096)
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            self.prune(SCRIPT_CACHE_MAX_AGE)
+
+    def __len__(self) -> int:
+        return len(self.scripts)
+
+    @staticmethod
+    def key(code: str) -> str:
+        return hashlib.sha256((SCRIPT_CACHE_VERSION + "\0" + code).encode()).hexdigest()
+
+    def read(self, key: str) -> Optional[bytes]:
+        if self.path is None:
+            return None
+
+        try:
+            with open(self.path + "/" + key + ".ast", "rb") as file:
+                data = file.read()
+        except OSError:
+            return None
+
+        os.utime(self.path + "/" + key + ".ast")
+
+        return data
+
+    def write(self, key: str, data: bytes) -> None:
+        if self.path is None:
+            return
+
+        temp = self.path + "/" + key + "." + str(os.getpid()) + ".tmp"
+
+        try:
+            with open(temp, "wb") as file:
+                file.write(data)
+
+            os.replace(temp, self.path + "/" + key + ".ast")
+        except OSError as exc:
+            print(f"failed to persist femscript ast {key}: {exc!r}")
+
+    def prune(self, max_age: float) -> None:
+        deadline = time.time() - max_age
+
+        for entry in os.scandir(self.path):
+            if entry.name[-4:] in (".ast", ".tmp") and entry.stat().st_mtime < deadline:
+                os.remove(entry.path)
+
+    def parse(self, code: str) -> list[AST]:
+        key = self.key(code)
+
+        if (entry := self.scripts.get(key)) is not None:
+            self.hits += 1
+            self.scripts.move_to_end(key)
+            return entry[0]
+
+        ast = None
+
+        if (data := self.read(key)) is not None:
+            try:
+                ast = pickle.loads(data)
+                self.disk_hits += 1
+            except Exception:
+                ast = None
+
+        if ast is None:
+            self.misses += 1
+            ast = Femscript(code).ast
+            data = pickle.dumps(ast, pickle.HIGHEST_PROTOCOL)
+            self.write(key, data)
+
+        self.scripts[key] = ast, len(data)
+        self.size += len(data)
+
+        while self.size > self.max_bytes and len(self.scripts) > 1:
+            _, (_, size) = self.scripts.popitem(last=False)
+            self.size -= size
+
+        return ast
+
+    def get_references(self, code: str) -> frozenset[str]:
+        key = self.key(code)
+
+        if (references := self.references.get(key)) is None:
+            references = self.references.set(key, collect_references(self.parse(code)))
+
+        return references
+
+    def compile(self, code: str, *, variables: list[dict[str, Any]], modules: FemscriptModules, ast: Optional[list[AST]] = None) -> Femscript:
+        femscript = Femscript(variables=variables, modules=modules)
+        femscript.ast = ast if ast is not None else self.parse(code)
+
+        return femscript
+
+@dataclass
+class GuildSettings:
+    guild_id: str
+    prefix: str = config.PREFIX
+    language: str = "en"
+    welcome_message: str = ""
+    welcome_channel: str = ""
+    leave_message: str = ""
+    autorole: str = ""
+    verification_role: str = ""
+    verification_message: str = ""
+    verification_channel: str = ""
+    interaction_callbacks: dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_model(cls, guild: Guilds) -> "GuildSettings":
+        return cls(guild.guild_id, **{key: getattr(guild, key) for key in SETTINGS_FIELDS})
+
+SETTINGS_FIELDS = tuple(item.name for item in fields(GuildSettings) if item.name != "guild_id")
+
+@dataclass
+class BootstrapStats:
+    guilds: int = 0
+    created: int = 0
+    queries: int = 0
+    load_time: float = 0
+    create_time: float = 0
+    total_time: float = 0
+
+    def __str__(self) -> str:
+        return f"{self.guilds} guilds ({self.created} created, {self.queries} queries, load {self.load_time:.2f}s, create {self.create_time:.2f}s, total {self.total_time:.2f}s)"
+
+def chunked(items: Iterable[Any], size: int) -> Iterator[list[Any]]:
+    chunk = []
+
+    for item in items:
+        chunk.append(item)
+
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+def default_guild(guild_id: str) -> Guilds:
+    return Guilds(
+        guild_id = guild_id,
+        prefix = config.PREFIX,
+        welcome_message = "",
+        welcome_channel = "",
+        leave_message = "",
+        autorole = "",
+        custom_commands = [],
+        database = {},
+        permissions = {},
+        schedules = [],
+        language = "en",
+        verification_role = "",
+        verification_message = "",
+        verification_channel = "",
+        eventhandlers = {},
+        interaction_callbacks = {}
+    )
+
+class GuildSettingsCache:
+    def __init__(self) -> None:
+        self.guilds: dict[str, GuildSettings] = {}
+        self.mention_prefixes: tuple[str, ...] = ()
+        self.prefixes: dict[str, tuple[str, ...]] = {}
+
+    def __contains__(self, guild_id: str) -> bool:
+        return guild_id in self.guilds
+
+    def __len__(self) -> int:
+        return len(self.guilds)
+
+    def get(self, guild_id: str) -> GuildSettings:
+        if (settings := self.guilds.get(guild_id)) is not None:
+            return settings
+
+        return GuildSettings(guild_id)
+
+    def get_prefixes(self, guild_id: str) -> tuple[str, ...]:
+        if (prefixes := self.prefixes.get(guild_id)) is None:
+            prefixes = self.prefixes[guild_id] = self.mention_prefixes + (self.get(guild_id).prefix or config.PREFIX,)
+
+        return prefixes
+
+    def set_mention_prefixes(self, prefixes: tuple[str, ...]) -> None:
+        self.mention_prefixes = prefixes
+        self.prefixes.clear()
+
+    def set(self, guild: Guilds) -> GuildSettings:
+        settings = self.guilds[guild.guild_id] = GuildSettings.from_model(guild)
+        self.prefixes.pop(guild.guild_id, None)
+        return settings
+
+    def remove(self, guild_id: str) -> Optional[GuildSettings]:
+        self.prefixes.pop(guild_id, None)
+        return self.guilds.pop(guild_id, None)
+
+    async def load(self, guild_id: str) -> GuildSettings:
+        guild = await Guilds.filter(guild_id=guild_id).only("guild_id", *SETTINGS_FIELDS).first()
+
+        if guild is None:
+            guild = default_guild(guild_id)
+            await guild.save()
+
+        return self.set(guild)
+
+    async def bootstrap(self, guild_ids: Iterable[str], chunk_size: int = BOOTSTRAP_CHUNK_SIZE) -> BootstrapStats:
+        stats = BootstrapStats()
+        start = time.perf_counter()
+
+        guild_ids = list(dict.fromkeys(guild_ids))
+        loaded: dict[str, GuildSettings] = {}
+
+        for chunk in chunked(guild_ids, chunk_size):
+            before = time.perf_counter()
+            rows = await Guilds.filter(guild_id__in=chunk).only("guild_id", *SETTINGS_FIELDS)
+            stats.load_time += time.perf_counter() - before
+            stats.queries += 1
+
+            for row in rows:
+                loaded[row.guild_id] = GuildSettings.from_model(row)
+
+        if missing := [default_guild(guild_id) for guild_id in guild_ids if guild_id not in loaded]:
+            before = time.perf_counter()
+            await Guilds.bulk_create(missing, batch_size=chunk_size)
+            stats.create_time += time.perf_counter() - before
+            stats.queries += -(-len(missing) // chunk_size)
+            stats.created = len(missing)
+
+            for guild in missing:
+                loaded[guild.guild_id] = GuildSettings.from_model(guild)
+
+        self.guilds.update(loaded)
+        self.prefixes.clear()
+
+        stats.guilds = len(loaded)
+        stats.total_time = time.perf_counter() - start
+
+        return stats
+
+    async def update(self, guild_id: str, **values: Any) -> GuildSettings:
+        for key in values:
+            if key not in SETTINGS_FIELDS:
+                raise KeyError(key)
+
+        if (settings := self.guilds.get(guild_id)) is None:
+            settings = await self.load(guild_id)
+
+        await Guilds.filter(guild_id=guild_id).update(**values)
+
+        for key, value in values.items():
+            setattr(settings, key, value)
+
+        if "prefix" in values:
+            self.prefixes.pop(guild_id, None)
+
+        return settings
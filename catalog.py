@@ -0,0 +1,227 @@
+"""
+Copyright 2022-2025 PoligonTeam
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from translation import Translation, TRANSLATIONS_PATH, parse_translations
+from cache import SCRIPT_CACHE_VERSION
+from collections.abc import Mapping
+
+import struct, pickle, json, mmap, sys, os
+
+from typing import Iterator, Optional, Any
+
+CATALOG_PATH = TRANSLATIONS_PATH + "/catalog.bin"
+
+MAGIC = b"FTC1"
+HEADER = struct.Struct("<4sI")
+COUNT = struct.Struct("<I")
+ENTRY = struct.Struct("<III")
+
+def get_sources(path: str = TRANSLATIONS_PATH) -> dict[str, int]:
+    sources = {}
+
+    for filename in sorted(os.listdir(path)):
+        if filename.endswith(".toml"):
+            sources[filename] = os.stat(path + "/" + filename).st_mtime_ns
+        elif os.path.isdir(path + "/" + filename):
+            for lang in sorted(os.listdir(path + "/" + filename)):
+                if lang.endswith(".fem"):
+                    sources[filename + "/" + lang] = os.stat(path + "/" + filename + "/" + lang).st_mtime_ns
+
+    return sources
+
+def parse_strings(path: str = TRANSLATIONS_PATH) -> dict[str, dict[int, str]]:
+    strings: dict[str, dict[int, str]] = {}
+
+    for filename in sorted(os.listdir(path)):
+        if not filename.endswith(".toml"):
+            continue
+
+        with open(path + "/" + filename, "r") as file:
+            lang = ""
+
+            for line in file:
+                if line[0] == "[":
+                    lang = line[1:-2]
+                    strings.setdefault(lang, {})
+                    continue
+                if line[0] == "\"":
+                    key, value = line.split(" = ", 1)
+                    strings[lang][int(key[1:-1], 16)] = value[1:-2].replace("\\n", "\n")
+
+    return strings
+
+def pack_strings(strings: dict[int, str]) -> bytes:
+    entries = bytearray(COUNT.pack(len(strings)))
+    blob = bytearray()
+
+    for key, value in sorted(strings.items()):
+        value = value.encode()
+        entries += ENTRY.pack(key, len(blob), len(value))
+        blob += value
+
+    return bytes(entries + blob)
+
+def build(path: str = TRANSLATIONS_PATH, output: str = CATALOG_PATH) -> None:
+    sources = get_sources(path)
+    index: dict[str, Any] = {"femscript": SCRIPT_CACHE_VERSION, "sources": sources, "strings": {}, "scripts": {}}
+    sections = []
+    offset = 0
+
+    def add_section(data: bytes) -> list[int]:
+        nonlocal offset
+        sections.append(data)
+        offset += len(data)
+        return [offset - len(data), len(data)]
+
+    for lang, strings in parse_strings(path).items():
+        index["strings"][lang] = add_section(pack_strings(strings))
+
+    for source in sources:
+        if not source.endswith(".fem"):
+            continue
+
+        cog, lang = source[:-4].split("/")
+
+        with open(path + "/" + source, "r") as file:
+            index["scripts"].setdefault(cog, {})[lang] = add_section(pickle.dumps(parse_translations(file.read()), pickle.HIGHEST_PROTOCOL))
+
+    header = json.dumps(index, separators=(",", ":")).encode()
+
+    with open(output + ".%d.tmp" % os.getpid(), "wb") as file:
+        file.write(HEADER.pack(MAGIC, len(header)))
+        file.write(header)
+
+        for section in sections:
+            file.write(section)
+
+    os.replace(output + ".%d.tmp" % os.getpid(), output)
+
+class CogTranslations(Mapping):
+    def __init__(self, catalog: "Catalog", cog: str) -> None:
+        self.catalog = catalog
+        self.cog = cog
+        self.languages: dict[str, dict[str, Translation]] = {}
+
+    def __getitem__(self, lang: str) -> dict[str, Translation]:
+        if (translations := self.languages.get(lang)) is None:
+            offset, length = self.catalog.index["scripts"][self.cog][lang]
+
+            translations = self.languages[lang] = {
+                sys.intern(name): Translation(name, ast, argc)
+                for name, argc, ast in pickle.loads(self.catalog.section(offset, length))
+            }
+
+        return translations
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.catalog.index["scripts"].get(self.cog, ()))
+
+    def __len__(self) -> int:
+        return len(self.catalog.index["scripts"].get(self.cog, ()))
+
+class Catalog(Mapping):
+    def __init__(self, path: str = TRANSLATIONS_PATH, catalog_path: str = CATALOG_PATH) -> None:
+        self.path = path
+        self.catalog_path = catalog_path
+
+        self.file = None
+        self.data: Optional[mmap.mmap] = None
+        self.index: dict[str, Any] = {}
+        self.base = 0
+
+        self.strings: dict[str, dict[int, str]] = {}
+        self.cogs: dict[str, CogTranslations] = {}
+
+        self.open()
+
+    def open(self) -> None:
+        if not self.load():
+            build(self.path, self.catalog_path)
+            self.load()
+
+    def load(self) -> bool:
+        if not os.path.exists(self.catalog_path):
+            return False
+
+        self.close()
+
+        self.file = open(self.catalog_path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, length = HEADER.unpack_from(self.data)
+
+        if magic != MAGIC:
+            self.close()
+            return False
+
+        self.index = json.loads(self.data[HEADER.size:HEADER.size + length])
+        self.base = HEADER.size + length
+
+        if self.index.get("femscript") != SCRIPT_CACHE_VERSION or self.index["sources"] != get_sources(self.path):
+            self.close()
+            return False
+
+        return True
+
+    def close(self) -> None:
+        if self.data is not None:
+            self.data.close()
+            self.file.close()
+
+        self.file = self.data = None
+        self.strings.clear()
+
+        for translations in self.cogs.values():
+            translations.languages.clear()
+
+    def section(self, offset: int, length: int) -> bytes:
+        return self.data[self.base + offset:self.base + offset + length]
+
+    def __getitem__(self, lang: str) -> dict[int, str]:
+        if (strings := self.strings.get(lang)) is None:
+            offset, _ = self.index["strings"][lang]
+            start = self.base + offset
+            count, = COUNT.unpack_from(self.data, start)
+            blob = start + COUNT.size + count * ENTRY.size
+
+            strings = self.strings[lang] = {
+                key: sys.intern(self.data[blob + value_offset:blob + value_offset + length].decode())
+                for key, value_offset, length in ENTRY.iter_unpack(self.data[start + COUNT.size:blob])
+            }
+
+        return strings
+
+    def __contains__(self, lang: object) -> bool:
+        return lang in self.index["strings"]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.index["strings"])
+
+    def __len__(self) -> int:
+        return len(self.index["strings"])
+
+    def scripts(self, cog: str) -> CogTranslations:
+        if (translations := self.cogs.get(cog)) is None:
+            translations = self.cogs[cog] = CogTranslations(self, cog)
+
+        return translations
+
+def main() -> None:
+    build()
+    print("built %s" % CATALOG_PATH)
+
+if __name__ == "__main__":
+    main()
@@ -16,9 +16,9 @@ limitations under the License.
 
 import femcord.femcord as femcord
 from femcord.femcord import commands, types
-from femscript import FemscriptModule
 from datetime import datetime, timedelta
-import asyncio, time, ast, inspect, models, os
+from database import metrics
+import asyncio, time, ast, inspect, models, stdlib, config
 
 from typing import Union, Optional, Any, TYPE_CHECKING
 
@@ -102,10 +102,10 @@ class Dev(commands.Cog):
     @commands.command(aliases=["rfs"])
     @commands.is_owner
     async def reload_fs(self, ctx: "Context"):
-        for filename in os.listdir("./femscript_modules"):
-            if filename[-4:] == ".fem":
-                with open("./femscript_modules/" + filename, "r") as f:
-                    self.bot.femscript_modules.add_module(FemscriptModule(filename[:-4], f.read()))
+        self.bot.native_modules = stdlib.load_modules(self.bot.femscript_modules, native=config.FEMSCRIPT_NATIVE_MODULES)
+
+        if self.bot.femscript_pool is not None:
+            self.bot.femscript_pool.restart()
 
         await ctx.reply("ok")
 
@@ -133,6 +133,51 @@ class Dev(commands.Cog):
 
         await ctx.reply(embed=embed)
 
+    @commands.command(description="fembot is a bot, the bot is fembot", usage="[reset]")
+    @commands.is_owner
+    async def dbstats(self, ctx: "Context", action: str = None):
+        if action == "reset":
+            metrics.reset()
+            return await ctx.reply("ok")
+
+        snapshot = metrics.snapshot()
+        pool, acquire = snapshot["pool"], snapshot["acquire"]
+
+        result = (
+            f"pool: {pool['size']}/{pool['max_size']} connections, {pool['idle']} idle, {pool['in_use']} in use (max {pool['max_in_use']}), {pool['waiting']} waiting\n"
+            f"acquire: {acquire['count']} times, avg {acquire['avg_time'] * 1000:.2f}ms, max {acquire['max_time'] * 1000:.2f}ms\n\n"
+        )
+
+        result += "\n".join(
+            f"{model}: {stats['count']} queries, {stats['errors']} errors, avg {stats['avg_time'] * 1000:.2f}ms, max {stats['max_time'] * 1000:.2f}ms"
+            for model, stats in sorted(snapshot["models"].items(), key=lambda item: item[1]["total_time"], reverse=True)
+        )
+
+        await ctx.reply_paginator(result, by_lines=True, prefix="```\n", suffix="```")
+
+    @commands.command(description="fembot is a bot, the bot is fembot", usage="[reset|minutes] [limit]")
+    @commands.is_owner
+    async def fsprofile(self, ctx: "Context", action: str = None, limit: int = 10):
+        if action == "reset":
+            self.bot.profiler.reset()
+            return await ctx.reply("ok")
+
+        if action is not None and not action.isdigit():
+            return await ctx.reply("usage: `%s %s`" % (ctx.command.name, ctx.command.usage))
+
+        window = int(action or 60) * 60
+        costs = self.bot.profiler.top(limit, window)
+
+        if not costs:
+            return await ctx.reply("no scripts were executed in the last %d minutes" % (window // 60))
+
+        result = "\n".join(
+            f"{cost.guild_id} {cost.script}: {cost.runs} runs, {cost.failures} failed, total {cost.execution_time * 1000:.0f}ms, avg {cost.avg_time * 1000:.2f}ms, max {cost.max_execution_time * 1000:.2f}ms, parse {cost.parse_time * 1000:.2f}ms, {cost.builtin_calls} builtin calls, {cost.http_requests} requests ({cost.http_time * 1000:.0f}ms)"
+            for cost in costs
+        )
+
+        await ctx.reply_paginator(result, by_lines=True, prefix="```\n", suffix="```")
+
     @commands.command(description="fembot is a bot, the bot is fembot", usage="(command)", aliases=["src"])
     @commands.is_owner
     async def source(self, ctx: "Context", *, command):
@@ -208,7 +253,7 @@ class Dev(commands.Cog):
 
         fake_message.author = fake_member.user
         fake_message.member = fake_member
-        fake_message.content = (await self.bot.get_prefix(self.bot, ctx.message))[-1] + command
+        fake_message.content = self.bot.get_prefixes(ctx.message)[-1] + command
 
         if args is not None:
             fake_message.content += " " + args
@@ -226,7 +271,7 @@ class Dev(commands.Cog):
     async def perf(self, ctx: "Context", command, *, args = None):
         fake_message = self.bot.gateway.copy(ctx.message)
 
-        fake_message.content = (await self.bot.get_prefix(self.bot, ctx.message))[-1] + command
+        fake_message.content = self.bot.get_prefixes(ctx.message)[-1] + command
 
         if args is not None:
             fake_message.content += " " + args
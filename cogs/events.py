@@ -22,8 +22,10 @@ from femcord.femcord.enums import MessageFlags
 from femcord.femcord.http import Route, HTTPException
 from femscript import Femscript, var # type: ignore
 from models import Guilds
+from joins import JoinPipeline
 import utils
-import hashlib, config
+import hashlib
+import config
 
 from typing import TYPE_CHECKING
 
@@ -34,6 +36,17 @@ class Events(commands.Cog):
     def __init__(self, bot: "Bot") -> None:
         self.bot = bot
 
+        self.joins = JoinPipeline(
+            bot.loop,
+            welcome = self.welcome,
+            autorole = self.autorole,
+            summary = self.welcome_summary,
+            concurrency = config.JOIN_CONCURRENCY,
+            raid_threshold = config.JOIN_RAID_THRESHOLD,
+            raid_window = config.JOIN_RAID_WINDOW,
+            summary_delay = config.JOIN_SUMMARY_DELAY
+        )
+
         @bot.before_call # type: ignore
         async def before_call(ctx: "Context | AppContext") -> None:
             if ctx.message is not None:
@@ -44,56 +57,71 @@ class Events(commands.Cog):
 
     @commands.Listener
     async def on_guild_create(self, guild: Guild):
-        exists = await Guilds.exists(guild_id=guild.id)
-
-        if not exists:
-            await Guilds.create(
-                guild_id = guild.id,
-                prefix = config.PREFIX,
-                welcome_message = "",
-                leave_message = "",
-                autorole = "",
-                custom_commands = [],
-                database = {},
-                permissions = {},
-                schedules = [],
-                language = "en",
-                verification_role = "",
-                verification_message = "",
-                verification_channel = "",
-                eventhandlers = {},
-                interaction_callbacks = {}
-            )
+        if guild.id not in self.bot.guild_settings:
+            await self.bot.guild_settings.load(guild.id)
 
         self.bot.loki.add_guild_log(guild)
 
     @commands.Listener
     async def on_guild_delete(self, guild: Guild):
         await Guilds.filter(guild_id=guild.id).delete()
+        await self.bot.storage.clear(guild.id)
+        self.bot.guild_settings.remove(guild.id)
         self.bot.loki.add_guild_log(guild, leave=True)
+        utils.invalidate_guild(guild.id)
 
     @commands.Listener
-    async def on_guild_member_add(self, guild: Guild, member: Member) -> None:
-        if not hasattr(guild, "welcome_message") or not hasattr(guild, "autorole"):
-            db_guild = await Guilds.filter(guild_id=guild.id).first()
+    async def on_raw_guild_update(self, data: dict) -> None:
+        utils.invalidate_guild(data["id"], "base")
+
+    @commands.Listener
+    async def on_raw_guild_role_create(self, data: dict) -> None:
+        utils.invalidate_guild(data["guild_id"], "roles")
+
+    @commands.Listener
+    async def on_raw_guild_role_update(self, data: dict) -> None:
+        utils.invalidate_guild(data["guild_id"], "roles")
+
+    @commands.Listener
+    async def on_raw_guild_role_delete(self, data: dict) -> None:
+        utils.invalidate_guild(data["guild_id"], "roles")
+
+    @commands.Listener
+    async def on_raw_channel_create(self, data: dict) -> None:
+        if "guild_id" in data:
+            utils.invalidate_guild(data["guild_id"], "channels")
+
+    @commands.Listener
+    async def on_raw_channel_update(self, data: dict) -> None:
+        if "guild_id" in data:
+            utils.invalidate_guild(data["guild_id"], "channels")
+
+    @commands.Listener
+    async def on_raw_channel_delete(self, data: dict) -> None:
+        if "guild_id" in data:
+            utils.invalidate_guild(data["guild_id"], "channels")
+
+    @commands.Listener
+    async def on_raw_guild_emojis_update(self, data: dict) -> None:
+        utils.invalidate_guild(data["guild_id"], "emojis")
+
+    @commands.Listener
+    async def on_raw_guild_stickers_update(self, data: dict) -> None:
+        utils.invalidate_guild(data["guild_id"], "stickers")
 
-            guild.prefix = db_guild.prefix
-            guild.welcome_message = db_guild.welcome_message
-            guild.leave_message = db_guild.leave_message
-            guild.autorole = db_guild.autorole
-            guild.language = db_guild.language
-            guild.interaction_callbacks = db_guild.interaction_callbacks
+    async def welcome(self, guild: Guild, member: Member) -> None:
+        settings = self.bot.guild_settings.get(guild.id)
 
-        if guild.welcome_message:
+        if settings.welcome_message:
             variables = [
                 {
                     "name": key,
                     "value": Femscript.to_fs(value)
                 }
-                for key, value in utils.convert(user=member.user, guild=guild).items()
+                for key, value in utils.convert(self.bot.scripts.get_references(settings.welcome_message), user=member.user, guild=guild).items()
             ]
 
-            femscript = Femscript(guild.welcome_message, variables=variables, modules=self.bot.femscript_modules)
+            femscript = self.bot.create_femscript(settings.welcome_message, variables=variables, guild_id=guild.id, script="welcome")
 
             @femscript.wrap_function()
             def set_channel(channel_id: str) -> None:
@@ -105,7 +133,7 @@ class Events(commands.Cog):
 
             femscript.wrap_function(utils.get_random_username, func_name="random_nick")
 
-            femscript.wrap_function(utils.request)
+            femscript.wrap_function(utils.request_for(guild.id))
 
             utils.wrap_builtins(femscript)
 
@@ -115,6 +143,9 @@ class Events(commands.Cog):
                 channel = guild.get_channel(femscript.channel_id)
 
                 if channel is not None:
+                    if channel.id != settings.welcome_channel:
+                        await self.bot.guild_settings.update(guild.id, welcome_channel=channel.id)
+
                     if hasattr(femscript, "is_components_v2"):
                         await channel.send(components=result, flags=[femcord.MessageFlags.IS_COMPONENTS_V2])
                     elif isinstance(result, femcord.Embed):
@@ -122,37 +153,59 @@ class Events(commands.Cog):
                     else:
                         await channel.send(content=str(result))
 
-        if guild.autorole:
-            await member.add_role(guild.get_role(guild.autorole))
+    async def welcome_summary(self, guild: Guild, members: list[Member]) -> None:
+        settings = self.bot.guild_settings.get(guild.id)
+
+        if not settings.welcome_message or not settings.welcome_channel:
+            return
+
+        channel = guild.get_channel(settings.welcome_channel)
+
+        if channel is None:
+            return
+
+        utils.set_translation_context(utils.TranslationContext(self.bot, guild))
+
+        names = ", ".join(member.user.username for member in members[:50])
+
+        if len(members) > 50:
+            names = await utils._("{} and {} more", names, len(members) - 50)
+
+        await channel.send(content=await utils._("**{}** new members joined: {}", len(members), names))
+
+    async def autorole(self, guild: Guild, member: Member) -> None:
+        settings = self.bot.guild_settings.get(guild.id)
+
+        if settings.autorole and (role := guild.get_role(settings.autorole)) is not None:
+            await member.add_role(role)
 
     @commands.Listener
-    async def on_guild_member_remove(self, guild: Guild, user: User) -> None:
-        if not hasattr(guild, "leave_message"):
-            db_guild = await Guilds.filter(guild_id=guild.id).first()
+    async def on_guild_member_add(self, guild: Guild, member: Member) -> None:
+        settings = self.bot.guild_settings.get(guild.id)
+
+        if settings.welcome_message or settings.autorole:
+            self.joins.submit(guild, member)
 
-            guild.prefix = db_guild.prefix
-            guild.welcome_message = db_guild.welcome_message
-            guild.leave_message = db_guild.leave_message
-            guild.autorole = db_guild.autorole
-            guild.language = db_guild.language
-            guild.interaction_callbacks = db_guild.interaction_callbacks
+    @commands.Listener
+    async def on_guild_member_remove(self, guild: Guild, user: User) -> None:
+        settings = self.bot.guild_settings.get(guild.id)
 
-        if guild.leave_message:
+        if settings.leave_message:
             variables = [
                 {
                     "name": key,
                     "value": Femscript.to_fs(value)
                 }
-                for key, value in utils.convert(user=user, guild=guild).items()
+                for key, value in utils.convert(self.bot.scripts.get_references(settings.leave_message), user=user, guild=guild).items()
             ]
 
-            femscript = Femscript(guild.leave_message, variables=variables, modules=self.bot.femscript_modules)
+            femscript = self.bot.create_femscript(settings.leave_message, variables=variables, guild_id=guild.id, script="leave")
 
             @femscript.wrap_function()
             def set_channel(channel_id: str) -> None:
                 femscript.channel_id = channel_id
 
-            femscript.wrap_function(utils.request)
+            femscript.wrap_function(utils.request_for(guild.id))
 
             result = await femscript.execute()
 
@@ -173,8 +226,8 @@ class Events(commands.Cog):
             return
 
         if message.guild.me and message.guild.me.user in message.mentions and not message.message_reference and len(message.content.split()) == 1:
-            if message.content in (await self.bot.get_prefix(self.bot, message))[:4]:
-                await message.reply(f"Prefix on this server is `{(await self.bot.get_prefix(self.bot, message))[-1]}`")
+            if message.content in self.bot.mention_prefixes:
+                await message.reply(f"Prefix on this server is `{self.bot.get_prefixes(message)[-1]}`")
                 return
 
     @commands.Listener
@@ -183,17 +236,16 @@ class Events(commands.Cog):
             return
 
         if interaction.data.custom_id == "verification" + interaction.guild.id:
-            query = Guilds.filter(guild_id=interaction.guild.id)
-            guild_db = await query.first()
+            settings = self.bot.guild_settings.get(interaction.guild.id)
 
-            if not guild_db or not guild_db.verification_message or not guild_db.verification_channel or not guild_db.verification_role:
+            if not settings.verification_message or not settings.verification_channel or not settings.verification_role:
                 return
 
-            if guild_db.verification_message == interaction.message.id and guild_db.verification_channel == interaction.channel.id:
+            if settings.verification_message == interaction.message.id and settings.verification_channel == interaction.channel.id:
                 await self.bot.ipc.emit("new_captcha", {
                     "guild_id": interaction.guild.id,
                     "user_id": interaction.user.id,
-                    "role_id": guild_db.verification_role,
+                    "role_id": settings.verification_role,
                     "guild_icon": interaction.guild.icon_as("png"),
                     "user_avatar": interaction.user.avatar_as("png")
                 }, nowait=True)
@@ -103,7 +103,7 @@ class Fun(commands.Cog):
 
     @commands.command(description="dog", aliases=["ars", "6vz", "piesvz", "<@338075554937044994>", "<@!338075554937044994>"])
     async def dog(self, ctx: "Context"):
-        alias = ctx.message.content.split()[0][len((await self.bot.get_prefix(self.bot, ctx.message))[-1]):]
+        alias = self.bot.match_prefix(ctx.message)[1].split()[0]
 
         if alias in ("6vz", "piesvz", "<@338075554937044994>", "<@!338075554937044994>"):
             return await ctx.reply(files=[("dog.png", open("./assets/images/6vz.png", "rb")), ("dog2.png", open("./assets/images/6vz2.png", "rb"))])
@@ -126,7 +126,7 @@ class Fun(commands.Cog):
 
     @commands.command(description="cat", aliases=["mesik", "<@563718132863074324>", "<@!563718132863074324>"])
     async def cat(self, ctx: "Context"):
-        alias = ctx.message.content.split()[0][len((await self.bot.get_prefix(self.bot, ctx.message))[-1]):]
+        alias = self.bot.match_prefix(ctx.message)[1].split()[0]
 
         if alias in ("mesik", "<@563718132863074324>", "<@!563718132863074324>"):
             return await ctx.reply(files=[("cat.jpg", open("./assets/images/mesik.jpg", "rb")), ("cat2.png", open("./assets/images/mesik2.jpg", "rb"))])
@@ -17,10 +17,11 @@ limitations under the License.
 import femcord.femcord as femcord
 from deezer import DeezerClient
 from femcord.femcord import commands, types, HTTPException
-from femscript import Femscript # type: ignore
-from utils import convert, wrap_builtins, request, get_artist_image, generate_waveform_from_audio_bytes, highlight
+from femscript import Femscript, AST # type: ignore
+from utils import convert, wrap_builtins, request_for, get_artist_image, generate_waveform_from_audio_bytes, highlight
 from aiohttp import ClientSession
 from models import LastFM as LastFMModel
+from cache import LRUCache
 from config import LASTFM_API_KEY, LASTFM_API_SECRET, LASTFM_API_URL, GROQ_API_KEYS
 from lastfm import Client, Track, Artist, exceptions
 from groq import Groq
@@ -32,6 +33,8 @@ from typing import Optional, Union, TYPE_CHECKING
 if TYPE_CHECKING:
     from bot import Bot, Context, AppContext
 
+SCRIPT_HEADER_PATTERN = re.compile(r"\A# DATE: [^\n]*\n# AUTHOR: [^\n]*\n\n")
+
 class LastFM(commands.Cog):
     client: femlink.Client
 
@@ -44,6 +47,20 @@ class LastFM(commands.Cog):
             with open("./cogs/templates/lastfm/" + filename, "r") as file:
                 self.templates[filename.split(".")[0]] = file.read()
 
+        self.compiled_templates: dict[str, list[AST]] = {template: bot.scripts.parse(template) for template in self.templates.values()}
+        self.user_scripts = LRUCache(4096)
+
+    def get_user_script(self, user_id: str, script: str) -> list[AST]:
+        if (entry := self.user_scripts.get(user_id)) is not None and entry[0] == script:
+            return entry[1]
+
+        if (ast := self.compiled_templates.get(SCRIPT_HEADER_PATTERN.sub("", script, count=1))) is None:
+            ast = self.bot.scripts.parse(script)
+
+        self.user_scripts.set(user_id, (script, ast))
+
+        return ast
+
     def progress_bar(self, progress: int, length: int) -> str:
         return "[" + "=" * int(progress / length * 20) + "-" * (20 - int(progress / length * 20)) + "] " + \
                f"{(progress % 3600) // 60}:{progress % 60:02d}/{(length % 3600) // 60}:{length % 60:02d}"
@@ -374,9 +391,9 @@ class LastFM(commands.Cog):
                     }
                 ]
 
-                femscript = Femscript(lastfm.script, variables=variables, modules=self.bot.femscript_modules)
+                femscript = self.bot.create_femscript(lastfm.script, variables=variables, guild_id=ctx.author.id, script="lastfm", ast=self.get_user_script(ctx.author.id, lastfm.script))
 
-                femscript.wrap_function(request)
+                femscript.wrap_function(request_for(ctx.author.id))
 
                 wrap_builtins(femscript)
 
@@ -409,6 +426,7 @@ class LastFM(commands.Cog):
                + script
 
         lastfm_user.script = script
+        self.user_scripts.pop(ctx.author.id)
 
         await lastfm_user.save()
         await ctx.reply("Script has been saved")
@@ -18,7 +18,6 @@ import femcord.femcord as femcord
 from femcord.femcord import commands, types, HTTPException
 from femscript import Femscript
 from utils import highlight
-from models import Guilds
 from utils import wrap_builtins
 import datetime, re
 
@@ -129,8 +128,7 @@ class Admin(commands.Cog):
         if len(prefix) > 5:
             return await ctx.reply(f"Prefix jest za długi (`{len(prefix)}/5`)")
 
-        await Guilds.filter(guild_id=ctx.guild.id).update(prefix=prefix)
-        ctx.guild.prefix = prefix
+        await self.bot.guild_settings.update(ctx.guild.id, prefix=prefix)
 
         await ctx.reply("Ustawiono prefix")
 
@@ -140,18 +138,15 @@ class Admin(commands.Cog):
         if lang not in ("en", "pl"):
             return await ctx.reply("Wybierz dostępny język (`en`/`pl`)")
 
-        await Guilds.filter(guild_id=ctx.guild.id).update(language=lang)
-        ctx.guild.language = lang
+        await self.bot.guild_settings.update(ctx.guild.id, language=lang)
 
         await ctx.reply("Ustawiono język")
 
     @set.command(description="Verification", usage="[code]", aliases=["verification"])
     @commands.has_permissions("manage_guild")
     async def captcha(self, ctx: "Context", *, code = None):
-        query = Guilds.filter(guild_id=ctx.guild.id)
-
         if code is None:
-            await query.update(verification_role="", verification_message="", verification_channel="")
+            await self.bot.guild_settings.update(ctx.guild.id, verification_role="", verification_message="", verification_channel="")
             return await ctx.reply("Disabled")
 
         if (match := re.match(r"(?:<#)?(\d+)>? (?:<@&)?(\d+)>? ([\s\S]+)", code)) is not None:
@@ -217,24 +212,20 @@ class Admin(commands.Cog):
             )
             message = await channel.send(**{"content" if not isinstance(result, femcord.Embed) else "embed": result}, components=components)
 
-        await query.update(verification_role=role.id, verification_message=message.id, verification_channel=channel.id)
+        await self.bot.guild_settings.update(ctx.guild.id, verification_role=role.id, verification_message=message.id, verification_channel=channel.id)
 
         await ctx.reply("Sent verification message")
 
     @set.command(description="Welcome message", usage="[code]", aliases=["welcome", "welcomemsg"])
     @commands.has_permissions("manage_guild")
     async def welcomemessage(self, ctx: "Context", *, code = None):
-        query = Guilds.filter(guild_id=ctx.guild.id)
-        guild_db = await query.first()
-
         if code is None:
-            await query.update(welcome_message="")
-            ctx.guild.welcome_message = ""
+            await self.bot.guild_settings.update(ctx.guild.id, welcome_message="")
 
             return await ctx.reply("Disabled")
 
         if code == "get_code()":
-            return await ctx.reply_paginator(highlight(guild_db.welcome_message), by_lines=True, base_embed=femcord.Embed(), prefix="```ansi\n", suffix="```")
+            return await ctx.reply_paginator(highlight(self.bot.guild_settings.get(ctx.guild.id).welcome_message), by_lines=True, base_embed=femcord.Embed(), prefix="```ansi\n", suffix="```")
         elif code == "emit()":
             events = self.bot.get_cog("Events")
             return await events.on_guild_member_add(ctx.guild, ctx.member)
@@ -255,25 +246,20 @@ class Admin(commands.Cog):
                f"# AUTHOR: {ctx.author.id}\n\n" \
              + code
 
-        await query.update(welcome_message=code)
-        ctx.guild.welcome_message = code
+        await self.bot.guild_settings.update(ctx.guild.id, welcome_message=code)
 
         await ctx.reply("Updated")
 
     @set.command(description="Leave message", usage="[code]", aliases=["leave", "leavemsg"])
     @commands.has_permissions("manage_guild")
     async def leavemessage(self, ctx: "Context", *, code = None):
-        query = Guilds.filter(guild_id=ctx.guild.id)
-        guild_db = await query.first()
-
         if code is None:
-            await query.update(leave_message="")
-            ctx.guild.leave_message = ""
+            await self.bot.guild_settings.update(ctx.guild.id, leave_message="")
 
             return await ctx.reply("Disabled")
 
         if code == "get_code()":
-            return await ctx.reply_paginator(guild_db.leave_message, by_lines=True, base_embed=femcord.Embed(), prefix="```ansi\n", suffix="```")
+            return await ctx.reply_paginator(self.bot.guild_settings.get(ctx.guild.id).leave_message, by_lines=True, base_embed=femcord.Embed(), prefix="```ansi\n", suffix="```")
         elif code == "emit()":
             events = self.bot.get_cog("Events")
             return await events.on_guild_member_remove(ctx.guild, ctx.author)
@@ -294,27 +280,22 @@ class Admin(commands.Cog):
                f"# AUTHOR: {ctx.author.id}\n\n" \
              + code
 
-        await query.update(leave_message=code)
-        ctx.guild.leave_message = code
+        await self.bot.guild_settings.update(ctx.guild.id, leave_message=code)
 
         await ctx.reply("Updated")
 
     @set.command(description="Ustawia autorole", usage="[rola]")
     @commands.has_permissions("manage_guild", "manage_roles")
     async def autorole(self, ctx: "Context", role: types.Role | str = None):
-        query = Guilds.filter(guild_id=ctx.guild.id)
-
         if role is None:
-            await query.update(autorole="")
-            ctx.guild.autorole = ""
+            await self.bot.guild_settings.update(ctx.guild.id, autorole="")
 
             return await ctx.reply("Wyłączono autorole")
 
         if ctx.member.roles[-1].position < role.position:
             return await ctx.reply("Nie możesz ustawić roli która jest wyższa od ciebie")
 
-        await query.update(autorole=role.id)
-        ctx.guild.autorole = role.id
+        await self.bot.guild_settings.update(ctx.guild.id, autorole=role.id)
 
         await ctx.reply("Ustawiono autorole")
 
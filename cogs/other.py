@@ -24,8 +24,11 @@ from poligonlgbt import get_extension
 from utils import *
 from types import CoroutineType
 from models import Guilds
+from cache import BOOTSTRAP_CHUNK_SIZE, chunked, root_references
+from prefixes import PrefixTrie
 from enum import Enum
-import config, datetime
+import datetime
+import copy
 
 from typing import Union, Literal, TypedDict, Any, Optional, TYPE_CHECKING
 
@@ -52,11 +55,31 @@ class CustomCommands(commands.Cog):
     description = "Commands that are available only on this server"
 
     def __init__(self):
-        self.prefixes = []
+        self.prefixes: dict[str, PrefixTrie] = {}
 
-    def append_prefix(self, prefix):
-        if prefix not in self.prefixes:
-            self.prefixes.append(prefix)
+    def add_prefix(self, guild_id: str, prefix: Optional[str]) -> None:
+        if not prefix:
+            return
+
+        if guild_id not in self.prefixes:
+            self.prefixes[guild_id] = PrefixTrie()
+
+        self.prefixes[guild_id].add(prefix)
+
+    def remove_prefix(self, guild_id: str, prefix: Optional[str]) -> None:
+        if not prefix or guild_id not in self.prefixes:
+            return
+
+        self.prefixes[guild_id].remove(prefix)
+
+        if not self.prefixes[guild_id]:
+            del self.prefixes[guild_id]
+
+    def match_prefixes(self, guild_id: str, content: str) -> list[tuple[str, str]]:
+        if (prefixes := self.prefixes.get(guild_id)) is None:
+            return []
+
+        return prefixes.match(content)
 
 class Other(commands.Cog):
     def __init__(self, bot: "Bot", custom_commands_cog: commands.Cog) -> None:
@@ -86,35 +109,21 @@ class Other(commands.Cog):
 
     @commands.Listener
     async def on_ready(self):
-        for guild in self.bot.gateway.guilds:
-            db_guild = await Guilds.filter(guild_id=guild.id).first()
-
-            if db_guild is None:
-                db_guild = await Guilds.create(
-                    guild_id = guild.id,
-                    prefix = config.PREFIX,
-                    welcome_message = "",
-                    leave_message = "",
-                    autorole = "",
-                    custom_commands = [],
-                    database = {},
-                    permissions = {},
-                    schedules = [],
-                    language = "en",
-                    verification_role = "",
-                    verification_message = "",
-                    verification_channel = "",
-                    eventhandlers = {},
-                    interaction_callbacks = {}
-                )
+        guild_ids = [guild.id for guild in self.bot.gateway.guilds]
+        guild_commands: dict[str, list[str]] = {}
+
+        for chunk in chunked(guild_ids, BOOTSTRAP_CHUNK_SIZE):
+            for guild_id, custom_commands in await Guilds.filter(guild_id__in=chunk).values_list("guild_id", "custom_commands"):
+                guild_commands[guild_id] = custom_commands
 
+        for guild_id, custom_commands in guild_commands.items():
             commands = []
 
-            for custom_command in db_guild.custom_commands:
+            for custom_command in custom_commands or []:
                 try:
                     command_data = (await self.get_command_data(custom_command))[1]
                     commands.append(command_data)
-                    self.create_custom_command(guild.id, command_data, custom_command)
+                    self.create_custom_command(guild_id, command_data, custom_command)
                 except FemscriptException:
                     pass
                 except Exception:
@@ -124,17 +133,18 @@ class Other(commands.Cog):
                 continue
 
             try:
-                await self.bot.http.request(Route("PUT", "applications", self.bot.gateway.bot_user.id, "guilds", guild.id, "commands"), data=[self.command_data_to_slash(command) for command in commands])
+                await self.bot.http.request(Route("PUT", "applications", self.bot.gateway.bot_user.id, "guilds", guild_id, "commands"), data=[self.command_data_to_slash(command) for command in commands])
             except femcord.HTTPException:
                 pass
 
     @commands.hybrid_command(description="pisaju skrypt", usage="(code)", aliases=["fs", "fscript", "cs", "cscript"])
     async def femscript(self, ctx: Union["Context", "AppContext"], *, code):
+        storage = None
         database = {}
 
         if ctx.guild:
-            guild = Guilds.get(guild_id=ctx.guild.id)
-            database = (await guild).database
+            storage = self.bot.storage.get(ctx.guild.id)
+            database = await storage.get_many(root_references(self.bot.scripts.get_references(code)))
 
         fake_token = var("token", "MTAwOTUwNjk4MjEyMzgwMjY4NA.G0LFJN.o7zP2DxrjQDQQIqjtVUEN98jmlB1bEQN1rTchQ")
 
@@ -156,25 +166,10 @@ class Other(commands.Cog):
             for key, value in (convert(author=ctx.author, channel=ctx.channel, guild=ctx.guild, member=ctx.member) | database).items()
         ]
 
-        femscript = Femscript(code, variables=variables, modules=self.bot.femscript_modules)
+        femscript = self.bot.create_femscript(code, variables=variables, guild_id=ctx.guild.id if ctx.guild else ctx.author.id, script="fs")
 
         if ctx.guild and ctx.member.permissions.has(femcord.enums.Permissions.MANAGE_GUILD):
-            @femscript.wrap_function()
-            def get_all() -> dict[str, object]:
-                return database
-
-            @femscript.wrap_function()
-            def get_value(key: str) -> Any:
-                return database.get(key)
-
-            @femscript.wrap_function()
-            def update[T](key: str, value: T) -> T:
-                database[key] = value
-                return value
-
-            @femscript.wrap_function()
-            def remove(key: str) -> Any:
-                return database.pop(key)
+            wrap_database(femscript, storage)
 
         @femscript.wrap_function()
         async def get_user(user: str) -> dict:
@@ -184,14 +179,15 @@ class Other(commands.Cog):
         def get_channel(channel: str) -> dict:
             return convert(_=ctx.guild.get_channel(channel)).get("_")
 
-        femscript.wrap_function(request)
+        femscript.wrap_function(request_for(ctx.guild.id if ctx.guild else ctx.author.id))
 
         wrap_builtins(femscript)
 
-        result = await femscript.execute(debug=ctx.author.id in self.bot.owners)
-
-        if ctx.guild:
-            await guild.update(database=database)
+        try:
+            result = await femscript.execute(debug=ctx.author.id in self.bot.owners)
+        finally:
+            if storage is not None:
+                self.bot.storage.commit(storage)
 
         if hasattr(femscript, "is_components_v2"):
             return await ctx.reply(components=result, flags=[femcord.MessageFlags.IS_COMPONENTS_V2])
@@ -228,18 +224,16 @@ class Other(commands.Cog):
         if message.author.bot or not message.guild:
             return
 
-        for prefix in self.custom_commands_cog.prefixes:
-            if prefix is not None and message.content.startswith(prefix):
-                command_name = message.content.split(" ")[0][len(prefix):]
-                command = self.bot.get_command(command_name, guild_id=message.guild.id)
+        for prefix, content in self.custom_commands_cog.match_prefixes(message.guild.id, message.content):
+            command = self.bot.get_command(content.split(" ")[0], guild_id=message.guild.id)
 
-                if not command or ("prefix" in command.other and not command.other["prefix"] == prefix):
-                    return
+            if not command or ("prefix" in command.other and not command.other["prefix"] == prefix):
+                continue
 
-                fake_message = self.bot.gateway.copy(message)
-                fake_message.content = (await self.bot.get_prefix(self.bot, message))[-1] + message.content[len(prefix):]
+            fake_message = copy.copy(message)
+            fake_message.content = self.bot.get_prefixes(message)[-1] + content
 
-                return await self.bot.process_commands(fake_message)
+            return await self.bot.process_commands(fake_message)
 
     async def get_command_data(self, code: str) -> tuple[CommandOperation, CommandData]:
         femscript = Femscript(code)
@@ -305,15 +299,12 @@ class Other(commands.Cog):
 
         await femscript.execute()
 
-        if command_data["prefix"] is not None:
-            self.custom_commands_cog.append_prefix(command_data["prefix"])
-
         return command_data.pop("operation"), command_data
 
     def create_custom_command(self, guild_id: str, command_data: CommandData, code: str) -> commands.Command:
         async def func(ctx: "Context", args: list = None) -> Any:
             async with femcord.Typing(ctx.channel):
-                guild = Guilds.get(guild_id=ctx.guild.id)
+                storage = self.bot.storage.get(ctx.guild.id)
 
                 if args is not None:
                     args = args[0]
@@ -351,8 +342,9 @@ class Other(commands.Cog):
 
                     args = dict(zip(command_data["arguments"].keys(), args))
 
-                converted = convert(guild=ctx.guild, channel=ctx.channel, author=ctx.author, member=ctx.member)
-                database = (await guild).database
+                references = self.bot.scripts.get_references(code)
+                converted = convert(references, guild=ctx.guild, channel=ctx.channel, author=ctx.author, member=ctx.member)
+                database = await storage.get_many(root_references(references))
 
                 variables = [
                     {
@@ -362,24 +354,9 @@ class Other(commands.Cog):
                     for key, value in (converted | (args or {}) | database).items()
                 ]
 
-                femscript = Femscript(code, variables=variables, modules=self.bot.femscript_modules)
+                femscript = self.bot.create_femscript(code, variables=variables, guild_id=ctx.guild.id, script="command:" + command_data["name"])
 
-                @femscript.wrap_function()
-                def get_all() -> dict[str, object]:
-                    return database
-
-                @femscript.wrap_function()
-                def get_value(key: str) -> Any:
-                    return database.get(key)
-
-                @femscript.wrap_function()
-                def update[T](key: str, value: T) -> T:
-                    database[key] = value
-                    return value
-
-                @femscript.wrap_function()
-                def remove(key: str) -> Any:
-                    return database.pop(key)
+                wrap_database(femscript, storage)
 
                 @femscript.wrap_function()
                 async def get_user(user: str) -> dict:
@@ -420,15 +397,16 @@ class Other(commands.Cog):
                 def get_channel(channel: str) -> dict:
                     return convert(_=ctx.guild.get_channel(channel)).get("_")
 
-                femscript.wrap_function(request)
+                femscript.wrap_function(request_for(ctx.guild.id))
 
                 wrap_builtins(femscript)
 
                 femscript.wrap_function(lambda *_, **__: None, func_name="command")
 
-                result = await femscript.execute()
-
-                await guild.update(database=database)
+                try:
+                    result = await femscript.execute()
+                finally:
+                    self.bot.storage.commit(storage)
 
                 if hasattr(femscript, "is_components_v2"):
                     return await ctx.reply(components=result, flags=[femcord.MessageFlags.IS_COMPONENTS_V2])
@@ -481,10 +459,15 @@ class Other(commands.Cog):
                 await func(ctx)
 
         self.custom_commands_cog.commands.append(command)
-        self.bot.commands.append(command)
+        self.custom_commands_cog.add_prefix(guild_id, command_data["prefix"])
+        self.bot.add_command(command)
 
         return command
 
+    def remove_custom_command(self, command: commands.Command) -> None:
+        self.bot.remove_command(command)
+        self.custom_commands_cog.remove_prefix(command.guild_id, command.other["prefix"])
+
     @commands.command(description="Creating a custom command", usage="(code)", aliases=["cc", "createcommand"])
     @commands.has_permissions("manage_guild", "manage_roles", "ban_members", "kick_members", "moderate_members")
     async def customcommand(self, ctx: "Context", *, code):
@@ -494,8 +477,8 @@ class Other(commands.Cog):
                f"# AUTHOR: {ctx.author.id}\n\n" \
              + code
 
-        guild = Guilds.get(guild_id=ctx.guild.id)
-        custom_commands = (await guild).custom_commands
+        query = Guilds.filter(guild_id=ctx.guild.id)
+        custom_commands = await query.first().values_list("custom_commands", flat=True) or []
 
         operation, command_data = await self.get_command_data(code)
 
@@ -517,9 +500,9 @@ class Other(commands.Cog):
                 raise commands.CommandNotFound()
 
             custom_commands.remove(command.other["code"])
-            self.bot.remove_command(command)
+            self.remove_custom_command(command)
 
-            await guild.update(custom_commands=custom_commands)
+            await query.update(custom_commands=custom_commands)
 
             try:
                 slash_commands = await self.bot.http.request(Route("GET", "applications", self.bot.gateway.bot_user.id, "guilds", ctx.guild.id, "commands"))
@@ -541,14 +524,14 @@ class Other(commands.Cog):
 
         if command_object is not None:
             custom_commands.remove(command_object.other["code"])
-            self.bot.remove_command(command_object)
+            self.remove_custom_command(command_object)
 
             text = "Updated"
 
         command = self.create_custom_command(ctx.guild.id, command_data, code)
 
         custom_commands.append(code)
-        await guild.update(custom_commands=custom_commands)
+        await query.update(custom_commands=custom_commands)
 
         try:
             await self.bot.http.request(Route("POST", "applications", self.bot.gateway.bot_user.id, "guilds", ctx.guild.id, "commands"), data=self.command_data_to_slash(command_data))
@@ -603,14 +586,16 @@ class Other(commands.Cog):
     async def on_interaction_create(self, interaction: femcord.types.Interaction):
         if interaction.type is InteractionTypes.APPLICATION_COMMAND and interaction.guild and (command := self.bot.get_command(interaction.data.name, guild_id=interaction.guild.id)):
             await self.handle_slash_command(interaction, command)
-        if not interaction.guild or interaction.data.custom_id not in interaction.guild.interaction_callbacks:
+        if not interaction.guild or interaction.data.custom_id not in (interaction_callbacks := self.bot.guild_settings.get(interaction.guild.id).interaction_callbacks):
             return
 
         await interaction.callback(InteractionCallbackTypes.DEFERRED_CHANNEL_MESSAGE_WITH_SOURCE, flags=[femcord.MessageFlags.EPHEMERAL])
 
-        guild = Guilds.get(guild_id=interaction.guild.id)
-        converted = convert(guild=interaction.guild, channel=interaction.channel, user=interaction.user, member=interaction.member, interaction=interaction)
-        database = (await guild).database
+        code = interaction_callbacks[interaction.data.custom_id]
+        storage = self.bot.storage.get(interaction.guild.id)
+        references = self.bot.scripts.get_references(code)
+        converted = convert(references, guild=interaction.guild, channel=interaction.channel, user=interaction.user, member=interaction.member, interaction=interaction)
+        database = await storage.get_many(root_references(references))
 
         variables = [
             {
@@ -620,24 +605,9 @@ class Other(commands.Cog):
             for key, value in (converted | database).items()
         ]
 
-        femscript = Femscript(interaction.guild.interaction_callbacks[interaction.data.custom_id], variables=variables, modules=self.bot.femscript_modules)
+        femscript = self.bot.create_femscript(code, variables=variables, guild_id=interaction.guild.id, script="interaction:" + interaction.data.custom_id)
 
-        @femscript.wrap_function()
-        def get_all() -> dict[str, object]:
-            return database
-
-        @femscript.wrap_function()
-        def get_value(key: str) -> Any:
-            return database.get(key)
-
-        @femscript.wrap_function()
-        def update[T](key: str, value: T) -> T:
-            database[key] = value
-            return value
-
-        @femscript.wrap_function()
-        def remove(key: str) -> Any:
-            return database.pop(key)
+        wrap_database(femscript, storage)
 
         @femscript.wrap_function()
         async def get_user(user: str) -> dict:
@@ -664,13 +634,14 @@ class Other(commands.Cog):
             member = await interaction.guild.get_member(user_id)
             await member.modify(communication_disabled_until=datetime.datetime.now(tz=timezone.utc) + datetime.timedelta(seconds=seconds))
 
-        femscript.wrap_function(request)
+        femscript.wrap_function(request_for(interaction.guild.id))
 
         wrap_builtins(femscript)
 
-        result = await femscript.execute()
-
-        await guild.update(database=database)
+        try:
+            result = await femscript.execute()
+        finally:
+            self.bot.storage.commit(storage)
 
         if hasattr(femscript, "is_components_v2"):
             return await interaction.edit(components=result, flags=[femcord.MessageFlags.EPHEMERAL, femcord.MessageFlags.IS_COMPONENTS_V2])
@@ -680,8 +651,7 @@ class Other(commands.Cog):
     @commands.command(description="Creating an interaction callback", usage="(custom_id) [code]", aliases=["bind"])
     @commands.has_permissions("manage_guild", "manage_roles")
     async def callback(self, ctx: "Context", custom_id, *, code = None) -> None:
-        guild = Guilds.get(guild_id=ctx.guild.id)
-        interaction_callbacks = (await guild).interaction_callbacks
+        interaction_callbacks = self.bot.guild_settings.get(ctx.guild.id).interaction_callbacks.copy()
 
         if code == "remove":
             if custom_id not in interaction_callbacks:
@@ -689,8 +659,7 @@ class Other(commands.Cog):
                 return
 
             interaction_callbacks.pop(custom_id)
-            ctx.guild.interaction_callbacks = interaction_callbacks
-            await guild.update(interaction_callbacks=interaction_callbacks)
+            await self.bot.guild_settings.update(ctx.guild.id, interaction_callbacks=interaction_callbacks)
 
             await ctx.reply("Callback has been removed")
             return
@@ -709,8 +678,7 @@ class Other(commands.Cog):
              + code
 
         interaction_callbacks[custom_id] = code
-        ctx.guild.interaction_callbacks = interaction_callbacks
-        await guild.update(interaction_callbacks=interaction_callbacks)
+        await self.bot.guild_settings.update(ctx.guild.id, interaction_callbacks=interaction_callbacks)
 
         await ctx.reply("Callback has been set")
 
@@ -188,6 +188,23 @@ class User:
 
         return web.json_response(guild_db)
 
+    @router.get("/scripts")
+    @router.get("/guilds/{guild_id}/scripts")
+    @logged_in
+    async def scripts(request: web.Request) -> web.Response:
+        try:
+            window = float(request.query.get("window", 3600))
+            limit = int(request.query.get("limit", 10))
+        except ValueError:
+            return web.HTTPBadRequest()
+
+        profile = await request.app.root.ipc.emit("get_script_profile", request["user_id"], request.match_info.get("guild_id"), window, min(limit, 100))
+
+        if isinstance(profile, int):
+            return web.Response(status=profile)
+
+        return web.json_response(profile)
+
     @router.post("/guilds/{guild_id}/{endpoint}")
     @router.get("/guilds/{guild_id}/options")
     @logged_in
@@ -213,7 +230,9 @@ class User:
         if not endpoints[endpoint].check(guild_db["guild"], data.get("value")):
             return web.HTTPBadRequest()
 
-        return web.HTTPOk()
+        status = await request.app.root.ipc.emit("update_guild_settings", request.match_info.get("guild_id"), request["user_id"], endpoint, data.get("value"))
+
+        return web.Response(status=status)
 
 def get_app(root: web.Application) -> User:
     return User(root)
\ No newline at end of file
@@ -0,0 +1,175 @@
+"""
+Copyright 2022-2025 PoligonTeam
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from tortoise import Tortoise
+from dataclasses import dataclass, asdict
+from contextlib import contextmanager
+
+import asyncpg, time, re
+
+from typing import Any, Optional, Iterator
+
+TABLE_PATTERN = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+\"?(\w+)\"?", re.IGNORECASE)
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    errors: int = 0
+    total_time: float = 0
+    max_time: float = 0
+
+    @property
+    def avg_time(self) -> float:
+        return self.total_time / self.count if self.count else 0
+
+    def record(self, elapsed: float, failed: bool) -> None:
+        self.count += 1
+        self.errors += failed
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+
+class DatabaseMetrics:
+    def __init__(self) -> None:
+        self.pool: Optional[asyncpg.Pool] = None
+        self.tables: dict[str, str] = {}
+        self.reset()
+
+    def reset(self) -> None:
+        self.acquires = 0
+        self.acquire_time = 0.0
+        self.max_acquire_time = 0.0
+        self.waiting = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.queries: dict[str, QueryStats] = {}
+
+    def model_for(self, query: str) -> str:
+        if not self.tables:
+            self.tables = {model._meta.db_table: model.__name__ for app in Tortoise.apps.values() for model in app.values()}
+
+        if (match := TABLE_PATTERN.search(query)) is None:
+            return "other"
+
+        return self.tables.get(match.group(1), match.group(1))
+
+    @contextmanager
+    def measure(self, query: str) -> Iterator[None]:
+        before = time.perf_counter()
+        failed = True
+
+        try:
+            yield
+            failed = False
+        finally:
+            model = self.model_for(query)
+
+            if (stats := self.queries.get(model)) is None:
+                stats = self.queries[model] = QueryStats()
+
+            stats.record(time.perf_counter() - before, failed)
+
+    def acquired(self, elapsed: float) -> None:
+        self.acquires += 1
+        self.acquire_time += elapsed
+        self.max_acquire_time = max(self.max_acquire_time, elapsed)
+        self.in_use += 1
+        self.max_in_use = max(self.max_in_use, self.in_use)
+
+    def released(self) -> None:
+        self.in_use -= 1
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "pool": {
+                "size": self.pool.get_size() if self.pool else 0,
+                "idle": self.pool.get_idle_size() if self.pool else 0,
+                "min_size": self.pool.get_min_size() if self.pool else 0,
+                "max_size": self.pool.get_max_size() if self.pool else 0,
+                "in_use": self.in_use,
+                "max_in_use": self.max_in_use,
+                "waiting": self.waiting
+            },
+            "acquire": {
+                "count": self.acquires,
+                "avg_time": self.acquire_time / self.acquires if self.acquires else 0,
+                "max_time": self.max_acquire_time
+            },
+            "models": {model: asdict(stats) | {"avg_time": stats.avg_time} for model, stats in sorted(self.queries.items())}
+        }
+
+metrics = DatabaseMetrics()
+
+class InstrumentedConnection(asyncpg.Connection):
+    async def execute(self, query: str, *args, **kwargs) -> str:
+        with metrics.measure(query):
+            return await super().execute(query, *args, **kwargs)
+
+    async def executemany(self, command: str, args, **kwargs) -> None:
+        with metrics.measure(command):
+            return await super().executemany(command, args, **kwargs)
+
+    async def fetch(self, query: str, *args, **kwargs) -> list:
+        with metrics.measure(query):
+            return await super().fetch(query, *args, **kwargs)
+
+    async def fetchrow(self, query: str, *args, **kwargs) -> Any:
+        with metrics.measure(query):
+            return await super().fetchrow(query, *args, **kwargs)
+
+    async def fetchval(self, query: str, *args, **kwargs) -> Any:
+        with metrics.measure(query):
+            return await super().fetchval(query, *args, **kwargs)
+
+class InstrumentedPool:
+    def __init__(self, pool: asyncpg.Pool) -> None:
+        self.pool = pool
+        metrics.pool = pool
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.pool, name)
+
+    async def acquire(self, *, timeout: Optional[float] = None) -> asyncpg.Connection:
+        metrics.waiting += 1
+        before = time.perf_counter()
+
+        try:
+            connection = await self.pool.acquire(timeout=timeout)
+        finally:
+            metrics.waiting -= 1
+
+        metrics.acquired(time.perf_counter() - before)
+
+        return connection
+
+    async def release(self, connection: asyncpg.Connection, *, timeout: Optional[float] = None) -> None:
+        metrics.released()
+        await self.pool.release(connection, timeout=timeout)
+
+def instrument(connection_name: str = "default") -> None:
+    client = Tortoise.get_connection(connection_name)
+
+    if getattr(client, "_pool", None) is not None:
+        if not isinstance(client._pool, InstrumentedPool):
+            client._pool = InstrumentedPool(client._pool)
+        return
+
+    create_pool = client.create_pool
+
+    async def create_instrumented_pool(**kwargs) -> InstrumentedPool:
+        return InstrumentedPool(await create_pool(**kwargs))
+
+    client.connection_class = InstrumentedConnection
+    client.create_pool = create_instrumented_pool
@@ -0,0 +1,144 @@
+"""
+Copyright 2022-2025 PoligonTeam
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from aiohttp import ClientSession, ClientTimeout, TCPConnector, ClientHttpProxyError
+from femscript import FemscriptException
+from dataclasses import dataclass, field
+from cache import LRUCache, MISSING
+
+import json, time
+
+from typing import Any, Optional
+
+MAX_CONTENT_LENGTH = 10 * 1024 * 1024
+MAX_CACHED_CONTENT_LENGTH = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+@dataclass
+class RateLimit:
+    tokens: float
+    updated_at: float = field(default_factory=time.monotonic)
+
+class ScriptHTTPClient:
+    def __init__(self, *, limit: int = 100, limit_per_host: int = 8, timeout: float = 10, rate: int = 20, period: float = 60, cache_size: int = 512, max_buckets: int = 10000, max_cache_ttl: float = 3600, proxy: Optional[str] = None) -> None:
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.rate = rate
+        self.period = period
+        self.max_cache_ttl = max_cache_ttl
+        self.proxy = proxy
+
+        self.session: Optional[ClientSession] = None
+        self.cache = LRUCache(cache_size, ttl=max_cache_ttl)
+        self.buckets = LRUCache(max_buckets, ttl=period)
+
+        self.requests = 0
+        self.cache_hits = 0
+        self.rate_limited = 0
+
+    def get_session(self) -> ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = ClientSession(
+                connector = TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host, ttl_dns_cache=300),
+                timeout = ClientTimeout(self.timeout),
+                headers = {"User-Agent": "femscript/1.0"}
+            )
+
+        return self.session
+
+    def acquire(self, bucket: str) -> Optional[float]:
+        now = time.monotonic()
+
+        if (rate_limit := self.buckets.get(bucket)) is None:
+            rate_limit = RateLimit(self.rate)
+
+        self.buckets.set(bucket, rate_limit)
+
+        rate_limit.tokens = min(self.rate, rate_limit.tokens + (now - rate_limit.updated_at) * self.rate / self.period)
+        rate_limit.updated_at = now
+
+        if rate_limit.tokens < 1:
+            return (1 - rate_limit.tokens) * self.period / self.rate
+
+        rate_limit.tokens -= 1
+
+    async def request(self, method: str, url: str, *, headers: Optional[dict] = None, cookies: Optional[dict] = None, data: Optional[dict] = None, cache: float = 0, bucket: Optional[str] = None) -> dict[str, Any]:
+        key = None
+
+        if cache > 0:
+            key = method.upper(), url, json.dumps([headers, cookies, data], sort_keys=True, default=str)
+
+            if (response := self.cache.get(key, MISSING)) is not MISSING:
+                self.cache_hits += 1
+                return response
+
+        if bucket is not None and (retry_after := self.acquire(bucket)) is not None:
+            self.rate_limited += 1
+
+            return {
+                "status": -1,
+                "text": f"Rate limited, try again in {retry_after:.1f}s",
+                "json": {}
+            }
+
+        self.requests += 1
+
+        try:
+            async with self.get_session().request(method, url, headers=headers, cookies=cookies, json=data, proxy=self.proxy) as response:
+                if response.content_length is not None and response.content_length > MAX_CONTENT_LENGTH:
+                    return {
+                        "status": -1,
+                        "text": "Content too large",
+                        "json": {}
+                    }
+
+                content = bytearray()
+
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    content += chunk
+
+                    if len(content) > MAX_CONTENT_LENGTH:
+                        return {
+                            "status": -1,
+                            "text": "Content too large",
+                            "json": {}
+                        }
+
+                data = {}
+
+                if response.content_type == "application/json":
+                    try:
+                        data = json.loads(content)
+                    except json.JSONDecodeError:
+                        data = {}
+
+                result = {
+                    "status": response.status,
+                    "text": content.decode(response.get_encoding()),
+                    "json": data
+                }
+        except ClientHttpProxyError as exc:
+            raise FemscriptException(f"ClientHttpProxyError: {exc.status}")
+
+        if key is not None and len(content) <= MAX_CACHED_CONTENT_LENGTH:
+            self.cache.set(key, result, min(cache, self.max_cache_ttl))
+
+        return result
+
+    async def close(self) -> None:
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
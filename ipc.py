@@ -24,11 +24,13 @@ from femcord.femcord.utils import get_index
 
 from models import Guilds
 
+from cache import SETTINGS_FIELDS
+
 import hashlib
 import config
 import aiohttp
 
-from typing import TypedDict, NotRequired, TYPE_CHECKING
+from typing import TypedDict, NotRequired, Any, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from .bot import Bot
@@ -188,7 +190,7 @@ class IPC(Client):
         return guilds
 
     @listener("get_guild_db")
-    async def get_guild_db(self, guild_id: str, user_id: str) -> Guilds | int:
+    async def get_guild_db(self, guild_id: str, user_id: str) -> dict | int:
         guild = self.bot.gateway.get_guild(guild_id)
 
         if not guild:
@@ -197,16 +199,17 @@ class IPC(Client):
         if not self.user_has_permissions(guild, user_id):
             return 403
 
-        guild = self.bot.gateway.get_guild(guild_id)
-        guild_db = await Guilds.get(guild_id=guild_id)
-        guild_db = guild_db.__dict__
+        guild_db = await Guilds.filter(guild_id=guild_id).first().values("custom_commands", "permissions", "schedules", "eventhandlers")
+
+        if guild_db is None:
+            return 404
 
-        for element in ("_partial", "_saved_in_db", "_custom_generated_pk", "id", "guild_id"):
-            del guild_db[element]
+        guild_db |= {key: getattr(self.bot.guild_settings.get(guild_id), key) for key in SETTINGS_FIELDS}
+        guild_db["database"] = await self.bot.storage.get(guild_id).get_all()
 
         guild_db["custom_commands"] = [
             {
-                "name": next(filter(lambda command: command.other.get("code") == custom_command and command.guild_id == guild_id, self.bot.commands)).other["display_name"],
+                "name": command.other["display_name"],
                 "metadata": {
                     key[2:]: value
                     for key, value in (custom_command.split(": ", 1) for custom_command in custom_command.split("\n", 4)[:4])
@@ -214,11 +217,65 @@ class IPC(Client):
                 "value": custom_command.split("\n", 5)[5]
             }
             for custom_command in guild_db["custom_commands"]
+            if (command := self.bot.command_registry.get_by_code(guild_id, custom_command)) is not None
         ]
         guild_db["guild"] = self.guild_to_dict(guild)
 
         return guild_db
 
+    @listener("get_script_profile")
+    async def get_script_profile(self, user_id: str, guild_id: str | None = None, window: float = 3600, limit: int = 10) -> dict | int:
+        if guild_id is None:
+            if user_id not in self.bot.owners:
+                return 403
+
+            return self.bot.profiler.snapshot(limit, window)
+
+        guild = self.bot.gateway.get_guild(guild_id)
+
+        if not guild:
+            return 404
+
+        if not self.user_has_permissions(guild, user_id) and user_id not in self.bot.owners:
+            return 403
+
+        return self.bot.profiler.snapshot(limit, window, guild_id)
+
+    @listener("update_guild_settings")
+    async def update_guild_settings(self, guild_id: str, user_id: str, key: str, value: Any) -> int:
+        guild = self.bot.gateway.get_guild(guild_id)
+
+        if not guild:
+            return 404
+
+        if not self.user_has_permissions(guild, user_id):
+            return 403
+
+        if key == "database":
+            if not isinstance(value, dict):
+                return 400
+
+            await self.update_guild_database(guild_id, value)
+            return 200
+
+        if key not in SETTINGS_FIELDS:
+            return 501 if key == "custom_commands" else 400
+
+        await self.bot.guild_settings.update(guild_id, **{key: value})
+
+        return 200
+
+    async def update_guild_database(self, guild_id: str, database: dict[str, Any]) -> None:
+        storage = self.bot.storage.get(guild_id)
+
+        for key in (await storage.get_all()).keys() - database.keys():
+            await storage.remove(key)
+
+        for key, value in database.items():
+            storage.set(key, value)
+
+        self.bot.storage.commit(storage)
+
     @listener("webhook_event")
     async def webhook_event(self, event: Event) -> None:
         channel = self.bot.gateway.get_channel("1369001448372699167")
@@ -0,0 +1,169 @@
+"""
+Copyright 2022-2025 PoligonTeam
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from femcord.femcord.types import Guild, Member
+from femcord.femcord.http import HTTPException
+from dataclasses import dataclass, field
+from collections import deque
+
+import asyncio, aiohttp, random, time
+
+from typing import Callable, Awaitable, Optional
+
+JoinHandler = Callable[[Guild, Member], Awaitable[None]]
+SummaryHandler = Callable[[Guild, list[Member]], Awaitable[None]]
+
+def get_retry_after(exc: Exception) -> Optional[float]:
+    if isinstance(exc, (asyncio.TimeoutError, aiohttp.ClientError)):
+        return 0
+
+    if not isinstance(exc, HTTPException):
+        return None
+
+    error = exc.original_error if isinstance(exc.original_error, dict) else {}
+
+    if "retry_after" in error:
+        return float(error["retry_after"])
+
+    if (status := getattr(exc, "status", None)) is not None:
+        return 0 if status == 429 or status >= 500 else None
+
+    return None if "code" in error else 0
+
+@dataclass
+class GuildJoins:
+    queue: deque[Member] = field(default_factory=deque)
+    joins: deque[float] = field(default_factory=deque)
+    coalesced: list[Member] = field(default_factory=list)
+    workers: int = 0
+    raid_until: float = 0
+    summary: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def idle(self) -> bool:
+        return not self.workers and not self.queue and not self.coalesced
+
+class JoinPipeline:
+    def __init__(self, loop: asyncio.AbstractEventLoop, *, welcome: JoinHandler, autorole: JoinHandler, summary: SummaryHandler, concurrency: int = 2, raid_threshold: int = 10, raid_window: float = 10, summary_delay: float = 15, max_queue: int = 1000, retries: int = 5, backoff: float = 1, max_backoff: float = 60) -> None:
+        self.loop = loop
+        self.welcome = welcome
+        self.autorole = autorole
+        self.summary = summary
+        self.concurrency = concurrency
+        self.raid_threshold = raid_threshold
+        self.raid_window = raid_window
+        self.summary_delay = summary_delay
+        self.max_queue = max_queue
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.guilds: dict[str, GuildJoins] = {}
+        self.dropped = 0
+
+    def get(self, guild_id: str) -> GuildJoins:
+        if (joins := self.guilds.get(guild_id)) is None:
+            joins = self.guilds[guild_id] = GuildJoins()
+
+        return joins
+
+    def track(self, joins: GuildJoins) -> None:
+        now = time.monotonic()
+
+        joins.joins.append(now)
+
+        while now - joins.joins[0] > self.raid_window:
+            joins.joins.popleft()
+
+        if len(joins.joins) > self.raid_threshold:
+            joins.raid_until = now + self.raid_window
+
+    def prune(self, guild_id: str) -> None:
+        if (joins := self.guilds.get(guild_id)) is None or not joins.idle:
+            return
+
+        if time.monotonic() - max(joins.joins[-1] if joins.joins else 0, joins.raid_until) >= self.raid_window:
+            del self.guilds[guild_id]
+
+    def submit(self, guild: Guild, member: Member) -> None:
+        joins = self.get(guild.id)
+        self.track(joins)
+
+        if len(joins.queue) >= self.max_queue:
+            self.dropped += 1
+            return
+
+        joins.queue.append(member)
+
+        while joins.workers < self.concurrency and joins.workers < len(joins.queue):
+            joins.workers += 1
+            self.loop.create_task(self.worker(guild, joins))
+
+    async def worker(self, guild: Guild, joins: GuildJoins) -> None:
+        try:
+            while joins.queue:
+                member = joins.queue.popleft()
+
+                if time.monotonic() < joins.raid_until:
+                    self.coalesce(guild, joins, member)
+                else:
+                    await self.run(self.welcome, guild, member)
+
+                await self.with_backoff(self.autorole, guild, member)
+        finally:
+            joins.workers -= 1
+
+            if joins.idle:
+                self.loop.call_later(self.raid_window, self.prune, guild.id)
+
+    def coalesce(self, guild: Guild, joins: GuildJoins, member: Member) -> None:
+        joins.coalesced.append(member)
+
+        if joins.summary is None:
+            joins.summary = self.loop.call_later(self.summary_delay, self.flush, guild, joins)
+
+    def flush(self, guild: Guild, joins: GuildJoins) -> None:
+        members, joins.coalesced = joins.coalesced, []
+        joins.summary = None
+
+        if members:
+            self.loop.create_task(self.run(self.summary, guild, members))
+
+        if joins.idle:
+            self.loop.call_later(self.raid_window, self.prune, guild.id)
+
+    async def run(self, handler: Callable[..., Awaitable[None]], *args) -> None:
+        try:
+            await handler(*args)
+        except Exception as exc:
+            print("join handler %s failed: %r" % (handler.__name__, exc))
+
+    async def with_backoff(self, handler: JoinHandler, guild: Guild, member: Member) -> None:
+        for attempt in range(self.retries):
+            try:
+                return await handler(guild, member)
+            except Exception as exc:
+                if (retry_after := get_retry_after(exc)) is None:
+                    print("join handler %s failed: %r" % (handler.__name__, exc))
+                    return
+
+                if attempt == self.retries - 1:
+                    print("join handler %s gave up after %d attempts: %r" % (handler.__name__, self.retries, exc))
+                    return
+
+                delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+                await asyncio.sleep(max(retry_after, delay / 2 + random.random() * delay / 2))
+
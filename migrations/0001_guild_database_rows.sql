@@ -0,0 +1,7 @@
+INSERT INTO guilddatabase (guild_id, key, value)
+SELECT guilds.guild_id::BIGINT, entry.key, entry.value
+FROM guilds, jsonb_each(guilds.database::JSONB) AS entry
+WHERE jsonb_typeof(guilds.database::JSONB) = 'object'
+ON CONFLICT (guild_id, key) DO UPDATE SET value = EXCLUDED.value;
+
+UPDATE guilds SET database = '{}' WHERE database::TEXT <> '{}';
@@ -0,0 +1,10 @@
+ALTER TABLE guilds ALTER COLUMN guild_id TYPE BIGINT USING guild_id::BIGINT;
+ALTER TABLE guilddatabase ALTER COLUMN guild_id TYPE BIGINT USING guild_id::BIGINT;
+ALTER TABLE users ALTER COLUMN user_id TYPE BIGINT USING user_id::BIGINT;
+ALTER TABLE lastfm ALTER COLUMN user_id TYPE BIGINT USING user_id::BIGINT;
+
+ALTER TABLE giveaways
+    ALTER COLUMN message_id TYPE BIGINT USING message_id::BIGINT,
+    ALTER COLUMN channel_id TYPE BIGINT USING channel_id::BIGINT,
+    ALTER COLUMN guild_id TYPE BIGINT USING guild_id::BIGINT,
+    ALTER COLUMN host_id TYPE BIGINT USING host_id::BIGINT;
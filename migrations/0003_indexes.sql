@@ -0,0 +1,11 @@
+DELETE FROM guilds AS duplicate USING guilds AS original WHERE duplicate.guild_id = original.guild_id AND duplicate.id < original.id;
+DELETE FROM users AS duplicate USING users AS original WHERE duplicate.user_id = original.user_id AND duplicate.id < original.id;
+DELETE FROM lastfm AS duplicate USING lastfm AS original WHERE duplicate.user_id = original.user_id AND duplicate.id < original.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS guilds_guild_id_uindex ON guilds (guild_id);
+CREATE UNIQUE INDEX IF NOT EXISTS users_user_id_uindex ON users (user_id);
+CREATE UNIQUE INDEX IF NOT EXISTS lastfm_user_id_uindex ON lastfm (user_id);
+
+CREATE INDEX IF NOT EXISTS giveaways_ended_end_time_index ON giveaways (ended, end_time);
+CREATE INDEX IF NOT EXISTS giveaways_guild_id_index ON giveaways (guild_id);
+CREATE INDEX IF NOT EXISTS artists_artist_index ON artists (artist);
@@ -0,0 +1,46 @@
+"""
+Copyright 2022-2025 PoligonTeam
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from tortoise.backends.base.client import BaseDBAsyncClient
+from models import Lyrics, normalize_track
+
+async def upgrade(connection: BaseDBAsyncClient) -> None:
+    await connection.execute_script(
+        "ALTER TABLE lyrics ADD COLUMN IF NOT EXISTS lookup_key TEXT;"
+        "ALTER TABLE lyrics ADD COLUMN IF NOT EXISTS content BYTEA;"
+        "ALTER TABLE lyrics ADD COLUMN IF NOT EXISTS found BOOLEAN NOT NULL DEFAULT TRUE;"
+        "ALTER TABLE lyrics ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();"
+        "ALTER TABLE lyrics ALTER COLUMN source DROP NOT NULL;"
+    )
+
+    _, columns = await connection.execute_query("SELECT 1 FROM information_schema.columns WHERE table_name = 'lyrics' AND column_name = 'lyrics'")
+
+    if columns:
+        _, rows = await connection.execute_query("SELECT id, artist, title, lyrics FROM lyrics WHERE content IS NULL")
+
+        for row in rows:
+            await connection.execute_query(
+                "UPDATE lyrics SET lookup_key = $1, content = $2 WHERE id = $3",
+                [normalize_track(row["artist"], row["title"]), Lyrics.compress(row["lyrics"]) if row["lyrics"] else None, row["id"]]
+            )
+
+        await connection.execute_script("ALTER TABLE lyrics DROP COLUMN lyrics")
+
+    await connection.execute_script(
+        "DELETE FROM lyrics WHERE id NOT IN (SELECT max(id) FROM lyrics GROUP BY lookup_key);"
+        "ALTER TABLE lyrics ALTER COLUMN lookup_key SET NOT NULL;"
+        "CREATE UNIQUE INDEX IF NOT EXISTS lyrics_lookup_key_uindex ON lyrics (lookup_key);"
+    )
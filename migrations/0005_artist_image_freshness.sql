@@ -0,0 +1,8 @@
+ALTER TABLE artists ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+ALTER TABLE artists ALTER COLUMN image DROP NOT NULL;
+
+DELETE FROM artists WHERE id NOT IN (SELECT max(id) FROM artists GROUP BY artist);
+
+DROP INDEX IF EXISTS artists_artist_index;
+CREATE UNIQUE INDEX IF NOT EXISTS artists_artist_uindex ON artists (artist);
+CREATE INDEX IF NOT EXISTS artists_updated_at_index ON artists (updated_at);
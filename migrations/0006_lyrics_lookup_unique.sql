@@ -0,0 +1,4 @@
+DELETE FROM lyrics WHERE id NOT IN (SELECT max(id) FROM lyrics GROUP BY lookup_key);
+
+DROP INDEX IF EXISTS lyrics_lookup_key_idx;
+CREATE UNIQUE INDEX IF NOT EXISTS lyrics_lookup_key_uindex ON lyrics (lookup_key);
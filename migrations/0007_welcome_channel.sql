@@ -0,0 +1 @@
+ALTER TABLE guilds ADD COLUMN IF NOT EXISTS welcome_channel TEXT NOT NULL DEFAULT '';
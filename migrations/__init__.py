@@ -0,0 +1,89 @@
+"""
+Copyright 2022-2025 PoligonTeam
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from tortoise import Tortoise
+from tortoise.transactions import in_transaction
+from tortoise.backends.base.client import BaseDBAsyncClient
+from dataclasses import dataclass
+
+import os, importlib.util
+
+from typing import Callable, Awaitable, Optional
+
+PATH = os.path.dirname(os.path.realpath(__file__))
+
+@dataclass
+class Migration:
+    version: str
+    sql: Optional[str] = None
+    upgrade: Optional[Callable[[BaseDBAsyncClient], Awaitable[None]]] = None
+
+    async def apply(self, connection: BaseDBAsyncClient) -> None:
+        if self.sql is not None:
+            await connection.execute_script(self.sql)
+
+        if self.upgrade is not None:
+            await self.upgrade(connection)
+
+def load_module(version: str, path: str) -> Callable[[BaseDBAsyncClient], Awaitable[None]]:
+    spec = importlib.util.spec_from_file_location("migrations.m" + version, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module.upgrade
+
+def get_migrations() -> list[Migration]:
+    migrations = []
+
+    for filename in sorted(os.listdir(PATH)):
+        path = PATH + "/" + filename
+
+        if filename[-4:] == ".sql":
+            with open(path, "r") as file:
+                migrations.append(Migration(filename[:-4], sql=file.read()))
+        elif filename[-3:] == ".py" and filename[:1].isdigit():
+            migrations.append(Migration(filename[:-3], upgrade=load_module(filename[:-3], path)))
+
+    return migrations
+
+async def get_applied_migrations(connection: BaseDBAsyncClient, create: bool = True) -> set[str]:
+    if create:
+        await connection.execute_script("CREATE TABLE IF NOT EXISTS schema_migrations (version TEXT PRIMARY KEY, applied_at TIMESTAMPTZ NOT NULL DEFAULT now())")
+    else:
+        _, tables = await connection.execute_query("SELECT 1 FROM information_schema.tables WHERE table_name = 'schema_migrations'")
+
+        if not tables:
+            return set()
+
+    _, rows = await connection.execute_query("SELECT version FROM schema_migrations")
+
+    return {row["version"] for row in rows}
+
+async def get_pending_migrations(connection_name: str = "default", create: bool = True) -> list[Migration]:
+    applied = await get_applied_migrations(Tortoise.get_connection(connection_name), create)
+    return [migration for migration in get_migrations() if migration.version not in applied]
+
+async def migrate(connection_name: str = "default") -> list[str]:
+    applied = []
+
+    for migration in await get_pending_migrations(connection_name):
+        async with in_transaction(connection_name) as connection:
+            await migration.apply(connection)
+            await connection.execute_query("INSERT INTO schema_migrations (version) VALUES ($1)", [migration.version])
+
+        applied.append(migration.version)
+
+    return applied
@@ -15,8 +15,11 @@ limitations under the License.
 """
 
 from tortoise.models import Model
-from tortoise.fields import Field, IntField, TextField, JSONField, BooleanField, DatetimeField
-import json
+from tortoise.fields import Field, IntField, TextField, JSONField, BooleanField, DatetimeField, BinaryField
+from functools import cached_property
+import json, zlib
+
+from typing import Optional
 
 class TextArray(Field):
     SQL_TYPE = "text[]"
@@ -48,11 +51,28 @@ class JSONArray(Field):
             return json.loads(value)
         return value
 
+class SnowflakeField(Field):
+    SQL_TYPE = "BIGINT"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+    def to_db_value(self, value, _):
+        if value is None:
+            return None
+        return int(value)
+
+    def to_python_value(self, value):
+        if value is None:
+            return None
+        return str(value)
+
 class Guilds(Model):
     id = IntField(pk=True)
-    guild_id = TextField()
+    guild_id = SnowflakeField()
     prefix = TextField()
     welcome_message = TextField()
+    welcome_channel = TextField(default="")
     leave_message = TextField()
     autorole = TextField()
     custom_commands = TextArray()
@@ -66,14 +86,23 @@ class Guilds(Model):
     eventhandlers = JSONField()
     interaction_callbacks = JSONField()
 
+class GuildDatabase(Model):
+    id = IntField(pk=True)
+    guild_id = SnowflakeField()
+    key = TextField()
+    value = JSONField(null=True)
+
+    class Meta:
+        unique_together = (("guild_id", "key"),)
+
 class Users(Model):
     id = IntField(pk=True)
-    user_id = TextField()
+    user_id = SnowflakeField()
     avatars = JSONArray()
 
 class LastFM(Model):
     id = IntField(pk=True)
-    user_id = TextField()
+    user_id = SnowflakeField()
     username = TextField()
     token = TextField()
     script = TextField()
@@ -82,22 +111,40 @@ class LastFM(Model):
 class Artists(Model):
     id = IntField(pk=True)
     artist = TextField()
-    image = TextField()
+    image = TextField(null=True)
+    updated_at = DatetimeField(auto_now=True)
+
+def normalize_track(artist: str, title: str) -> str:
+    return " ".join(artist.casefold().split()) + "\n" + " ".join(title.casefold().split())
 
 class Lyrics(Model):
     id = IntField(pk=True)
+    lookup_key = TextField()
     artist = TextField()
     title = TextField()
-    source = TextField()
-    lyrics = TextField()
+    source = TextField(null=True)
+    content = BinaryField(null=True)
+    found = BooleanField(default=True)
+    updated_at = DatetimeField(auto_now=True)
+
+    @staticmethod
+    def compress(lyrics: str) -> bytes:
+        return zlib.compress(lyrics.encode(), 9)
+
+    @cached_property
+    def lyrics(self) -> Optional[str]:
+        if self.content is None:
+            return None
+
+        return zlib.decompress(self.content).decode()
 
 class Giveaways(Model):
     id = IntField(pk=True)
-    message_id = TextField()
-    channel_id = TextField()
-    guild_id = TextField()
+    message_id = SnowflakeField()
+    channel_id = SnowflakeField()
+    guild_id = SnowflakeField()
     prize = TextField()
-    host_id = TextField()
+    host_id = SnowflakeField()
     winner_count = IntField()
     end_time = DatetimeField()
     participants = TextArray()
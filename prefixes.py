@@ -0,0 +1,86 @@
+"""
+Copyright 2022-2025 PoligonTeam
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from typing import Iterable
+
+END = ""
+
+class PrefixTrie:
+    def __init__(self, prefixes: Iterable[str] = ()) -> None:
+        self.root: dict[str, dict] = {}
+        self.counts: dict[str, int] = {}
+
+        for prefix in prefixes:
+            self.add(prefix)
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def __contains__(self, prefix: str) -> bool:
+        return prefix in self.counts
+
+    def add(self, prefix: str) -> None:
+        if not prefix:
+            return
+
+        if prefix in self.counts:
+            self.counts[prefix] += 1
+            return
+
+        self.counts[prefix] = 1
+        node = self.root
+
+        for char in prefix:
+            node = node.setdefault(char, {})
+
+        node[END] = prefix
+
+    def remove(self, prefix: str) -> None:
+        if prefix not in self.counts:
+            return
+
+        self.counts[prefix] -= 1
+
+        if self.counts[prefix] > 0:
+            return
+
+        del self.counts[prefix]
+
+        path = [self.root]
+
+        for char in prefix:
+            path.append(path[-1][char])
+
+        del path[-1][END]
+
+        for index in range(len(prefix), 0, -1):
+            if path[index]:
+                break
+
+            del path[index - 1][prefix[index - 1]]
+
+    def match(self, text: str) -> list[tuple[str, str]]:
+        node = self.root
+        found = []
+
+        for char in text:
+            if (node := node.get(char)) is None:
+                break
+
+            if END in node:
+                found.append(node[END])
+
+        return [(prefix, text[len(prefix):]) for prefix in reversed(found)]
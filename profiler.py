@@ -0,0 +1,176 @@
+"""
+Copyright 2022-2025 PoligonTeam
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from dataclasses import dataclass, field, asdict
+from collections import deque
+
+import functools, inspect, time
+
+from typing import Callable, Optional, Any
+
+HTTP_FUNCTIONS = frozenset(("request",))
+
+@dataclass
+class ScriptRun:
+    guild_id: str
+    script: str
+    parse_time: float = 0
+    execution_time: float = 0
+    cpu_time: Optional[float] = None
+    builtin_calls: int = 0
+    http_requests: int = 0
+    http_time: float = 0
+    failed: bool = False
+    timestamp: float = field(default_factory=time.time)
+
+@dataclass
+class ScriptCost:
+    guild_id: str
+    script: str
+    runs: int = 0
+    failures: int = 0
+    parse_time: float = 0
+    execution_time: float = 0
+    max_execution_time: float = 0
+    builtin_calls: int = 0
+    http_requests: int = 0
+    http_time: float = 0
+
+    @property
+    def avg_time(self) -> float:
+        return self.execution_time / self.runs if self.runs else 0
+
+    def add(self, run: ScriptRun) -> None:
+        self.runs += 1
+        self.failures += run.failed
+        self.parse_time += run.parse_time
+        self.execution_time += run.execution_time
+        self.max_execution_time = max(self.max_execution_time, run.execution_time)
+        self.builtin_calls += run.builtin_calls
+        self.http_requests += run.http_requests
+        self.http_time += run.http_time
+
+class ProfiledFemscript:
+    def __init__(self, femscript: Any, profiler: "FemscriptProfiler", run: ScriptRun) -> None:
+        self.femscript = femscript
+        self.profiler = profiler
+        self.run = run
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.femscript, name)
+
+    def add_variable(self, variable: dict[str, Any]) -> None:
+        self.femscript.add_variable(variable)
+
+    def count(self, name: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        run = self.run
+        is_http = name in HTTP_FUNCTIONS
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs) -> Any:
+                run.builtin_calls += 1
+
+                if not is_http:
+                    return await func(*args, **kwargs)
+
+                before = time.perf_counter()
+
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    run.http_requests += 1
+                    run.http_time += time.perf_counter() - before
+
+            return wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs) -> Any:
+            run.builtin_calls += 1
+            return func(*args, **kwargs)
+
+        return wrapper
+
+    def wrap_function(self, func: Optional[Callable[..., Any]] = None, *, func_name: Optional[str] = None) -> Callable[..., Any]:
+        def wrapper(func: Callable[..., Any]) -> Callable[..., Any]:
+            if inspect.isclass(func):
+                self.femscript.wrap_function(func, func_name=func_name)
+            else:
+                self.femscript.wrap_function(self.count(func_name or func.__name__, func), func_name=func_name or func.__name__)
+
+            return func
+
+        if func is not None:
+            return wrapper(func)
+
+        return wrapper
+
+    async def execute(self, debug: bool = False) -> Any:
+        before = time.perf_counter()
+        self.run.failed = True
+
+        try:
+            result = await self.femscript.execute(debug=debug)
+            self.run.failed = False
+        finally:
+            self.run.execution_time = time.perf_counter() - before
+
+            if (parse_time := getattr(self.femscript, "parse_time", None)) is not None:
+                self.run.parse_time = parse_time
+
+            self.run.cpu_time = getattr(self.femscript, "cpu_time", None)
+            self.profiler.record(self.run)
+
+        return result
+
+class FemscriptProfiler:
+    def __init__(self, history: int = 50000) -> None:
+        self.runs: deque[ScriptRun] = deque(maxlen=history)
+
+    def profile(self, femscript: Any, *, guild_id: str, script: str, parse_time: float = 0) -> ProfiledFemscript:
+        return ProfiledFemscript(femscript, self, ScriptRun(guild_id, script, parse_time))
+
+    def record(self, run: ScriptRun) -> None:
+        run.timestamp = time.time()
+        self.runs.append(run)
+
+    def reset(self) -> None:
+        self.runs.clear()
+
+    def top(self, limit: int = 10, window: float = 3600, guild_id: Optional[str] = None) -> list[ScriptCost]:
+        since = time.time() - window
+        costs: dict[tuple[str, str], ScriptCost] = {}
+
+        for run in reversed(self.runs):
+            if run.timestamp < since:
+                break
+
+            if guild_id is not None and run.guild_id != guild_id:
+                continue
+
+            if (cost := costs.get((run.guild_id, run.script))) is None:
+                cost = costs[run.guild_id, run.script] = ScriptCost(run.guild_id, run.script)
+
+            cost.add(run)
+
+        return sorted(costs.values(), key=lambda cost: cost.execution_time, reverse=True)[:limit]
+
+    def snapshot(self, limit: int = 10, window: float = 3600, guild_id: Optional[str] = None) -> dict[str, Any]:
+        return {
+            "window": window,
+            "runs": len(self.runs),
+            "scripts": [asdict(cost) | {"avg_time": cost.avg_time} for cost in self.top(limit, window, guild_id)]
+        }
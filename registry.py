@@ -0,0 +1,106 @@
+"""
+Copyright 2022-2025 PoligonTeam
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from femcord.femcord import commands
+
+from typing import Optional, Iterable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from bot import Bot
+
+class CommandRegistry:
+    def __init__(self, bot: "Bot") -> None:
+        self.bot = bot
+        self.dirty = True
+
+        self.names: dict[str, commands.Command] = {}
+        self.guild_names: dict[tuple[str, str], commands.Command] = {}
+        self.codes: dict[tuple[str, str], commands.Command] = {}
+
+    def keys(self, command: commands.Command) -> Iterable[str]:
+        yield command.name
+        yield from command.aliases or ()
+
+    def index(self, command: commands.Command) -> None:
+        if command.type is commands.CommandTypes.SUBCOMMAND:
+            return
+
+        if not command.guild_id:
+            for key in self.keys(command):
+                self.names.setdefault(key, command)
+            return
+
+        for key in self.keys(command):
+            self.guild_names.setdefault((command.guild_id, key), command)
+
+        if (code := command.other.get("code")) is not None:
+            self.codes[command.guild_id, code] = command
+
+    def unindex(self, command: commands.Command) -> None:
+        def discard(index: dict, key) -> None:
+            if index.get(key) is command:
+                del index[key]
+
+        if command.type is commands.CommandTypes.SUBCOMMAND:
+            return
+
+        if not command.guild_id:
+            for key in self.keys(command):
+                discard(self.names, key)
+            return
+
+        for key in self.keys(command):
+            discard(self.guild_names, (command.guild_id, key))
+
+        if (code := command.other.get("code")) is not None:
+            discard(self.codes, (command.guild_id, code))
+
+    def rebuild(self) -> None:
+        self.names.clear()
+        self.guild_names.clear()
+        self.codes.clear()
+
+        for command in self.bot.commands:
+            self.index(command)
+
+        self.dirty = False
+
+    def invalidate(self) -> None:
+        self.dirty = True
+
+    def add(self, command: commands.Command) -> None:
+        if not self.dirty:
+            self.index(command)
+
+    def remove(self, command: commands.Command) -> None:
+        if not self.dirty:
+            self.unindex(command)
+
+    def get(self, name: str, guild_id: Optional[str] = None) -> Optional[commands.Command]:
+        if self.dirty:
+            self.rebuild()
+
+        if (command := self.names.get(name)) is not None:
+            return command
+
+        if guild_id is not None:
+            return self.guild_names.get((guild_id, name))
+
+    def get_by_code(self, guild_id: str, code: str) -> Optional[commands.Command]:
+        if self.dirty:
+            self.rebuild()
+
+        return self.codes.get((guild_id, code))
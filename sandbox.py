@@ -0,0 +1,367 @@
+"""
+Copyright 2022-2025 PoligonTeam
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from femscript import Femscript, FemscriptModules, FemscriptException, AST
+from multiprocessing.connection import Connection
+from dataclasses import dataclass, field
+from cache import ScriptCache, LRUCache
+from stdlib import NativeModule, load_modules, wrap_native_modules
+
+import multiprocessing, asyncio, inspect, signal, time
+
+from typing import Callable, Optional, Any
+
+context = multiprocessing.get_context("spawn")
+
+PRECOMPILED_SIZE = 256
+
+class FemscriptLimitExceeded(FemscriptException):
+    pass
+
+def make_stub(connection: Connection, name: str, is_async: bool) -> Callable[..., Any]:
+    def call(*args, **kwargs) -> Any:
+        connection.send(("call", name, args, kwargs))
+        status, value = connection.recv()
+
+        if status == "raise":
+            raise value
+
+        return value
+
+    if not is_async:
+        return call
+
+    async def async_call(*args, **kwargs) -> Any:
+        return call(*args, **kwargs)
+
+    return async_call
+
+async def run_job(connection: Connection, ast: list[AST], modules: FemscriptModules, native_modules: list[NativeModule], variables: list[dict[str, Any]], functions: list[tuple[str, bool]], debug: bool) -> Any:
+    femscript = Femscript(variables=variables, modules=modules)
+    femscript.ast = ast
+
+    wrap_native_modules(femscript, native_modules)
+
+    for name, is_async in functions:
+        femscript.wrap_function(make_stub(connection, name, is_async), func_name=name)
+
+    return await femscript.execute(debug=debug)
+
+def worker_main(connection: Connection, modules_path: str, native: bool, script_cache_path: Optional[str], script_cache_size: int) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    loop = asyncio.new_event_loop()
+    scripts = ScriptCache(script_cache_path, script_cache_size)
+    modules = FemscriptModules()
+    native_modules = load_modules(modules, modules_path, native)
+    precompiled = LRUCache(PRECOMPILED_SIZE)
+
+    while True:
+        try:
+            code, key, ast, variables, functions, debug = connection.recv()
+        except (EOFError, OSError):
+            return
+
+        before = time.process_time()
+        parse_time = 0
+
+        try:
+            if ast is not None:
+                precompiled.set(key, ast)
+            elif key is None or (ast := precompiled.get(key)) is None:
+                started = time.perf_counter()
+                ast = scripts.parse(code)
+                parse_time = time.perf_counter() - started
+
+            response = "done", loop.run_until_complete(run_job(connection, ast, modules, native_modules, variables, functions, debug))
+        except Exception as exc:
+            response = "error", exc
+
+        cpu_time = time.process_time() - before
+
+        try:
+            connection.send((*response, cpu_time, parse_time))
+        except Exception as exc:
+            connection.send(("error", FemscriptException(f"result could not be sent back: {exc!r}"), cpu_time, parse_time))
+
+@dataclass
+class GuildBudget:
+    semaphore: asyncio.Semaphore
+    window_start: float = field(default_factory=time.monotonic)
+    cpu_time: float = 0
+    wall_time: float = 0
+    executions: int = 0
+    running: int = 0
+
+    def expired(self, window: float) -> bool:
+        return not self.running and time.monotonic() - self.window_start >= window
+
+    def rollover(self, window: float) -> None:
+        if time.monotonic() - self.window_start >= window:
+            self.window_start = time.monotonic()
+            self.cpu_time = self.wall_time = 0
+            self.executions = 0
+
+    def charge(self, cpu_time: float, wall_time: float) -> None:
+        self.cpu_time += cpu_time
+        self.wall_time += wall_time
+        self.executions += 1
+
+class Worker:
+    def __init__(self, pool: "FemscriptPool") -> None:
+        self.pool = pool
+        self.generation = pool.generation
+
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=worker_main, args=(child, pool.modules_path, pool.native_modules, pool.script_cache_path, pool.script_cache_size), daemon=True)
+        self.process.start()
+        child.close()
+
+        self.precompiled: set[str] = set()
+        self.femscript: Optional["RemoteFemscript"] = None
+        self.future: Optional[asyncio.Future[tuple[str, Any, float, float]]] = None
+
+        pool.loop.add_reader(self.connection.fileno(), self.on_readable)
+
+    def on_readable(self) -> None:
+        try:
+            message = self.connection.recv()
+        except (EOFError, OSError):
+            self.kill()
+            return
+
+        if message[0] == "call":
+            self.pool.loop.create_task(self.call(*message[1:]))
+        elif self.future is not None and not self.future.done():
+            self.future.set_result(message)
+
+    async def call(self, name: str, args: tuple[Any, ...], kwargs: dict[str, Any]) -> None:
+        try:
+            result = self.femscript.functions[name](*args, **kwargs)
+
+            if inspect.isawaitable(result):
+                result = await result
+
+            response = "return", result
+        except Exception as exc:
+            response = "raise", exc
+
+        try:
+            self.connection.send(response)
+        except (BrokenPipeError, OSError):
+            pass
+        except Exception as exc:
+            self.connection.send(("raise", FemscriptException(repr(exc))))
+
+    async def run(self, femscript: "RemoteFemscript", debug: bool) -> tuple[str, Any, float, float]:
+        self.femscript = femscript
+        self.future = self.pool.loop.create_future()
+
+        functions = [(name, inspect.iscoroutinefunction(func)) for name, func in femscript.functions.items()]
+        key = ast = None
+
+        if femscript.ast is not None:
+            key = ScriptCache.key(femscript.code)
+
+            if key not in self.precompiled:
+                ast = femscript.ast
+
+                if len(self.precompiled) >= PRECOMPILED_SIZE:
+                    self.precompiled.clear()
+
+                self.precompiled.add(key)
+
+        try:
+            self.connection.send((femscript.code, key, ast, femscript.variables, functions, debug))
+            return await self.future
+        finally:
+            self.femscript = None
+            self.future = None
+
+    @property
+    def alive(self) -> bool:
+        return self.process.is_alive() and not self.connection.closed
+
+    def kill(self) -> None:
+        if not self.connection.closed:
+            self.pool.loop.remove_reader(self.connection.fileno())
+            self.connection.close()
+
+        if self.process.is_alive():
+            self.process.kill()
+
+        self.process.join(0)
+
+        if self.future is not None and not self.future.done():
+            self.future.set_exception(FemscriptException("femscript worker exited"))
+
+class RemoteFemscript:
+    def __init__(self, pool: "FemscriptPool", code: str, variables: list[dict[str, Any]], guild_id: str, ast: Optional[list[AST]] = None) -> None:
+        self.pool = pool
+        self.code = code
+        self.ast = ast
+        self.variables = list(variables)
+        self.guild_id = guild_id
+        self.functions: dict[str, Callable[..., Any]] = {}
+        self.parse_time: Optional[float] = None
+        self.cpu_time: Optional[float] = None
+
+    def add_variable(self, variable: dict[str, Any]) -> None:
+        self.variables.append(variable)
+
+    def wrap_function(self, func: Optional[Callable[..., Any]] = None, *, func_name: Optional[str] = None) -> Callable[..., Any]:
+        def wrapper(func: Callable[..., Any]) -> Callable[..., Any]:
+            self.functions[func_name or func.__name__] = func
+            return func
+
+        if func is not None:
+            return wrapper(func)
+
+        return wrapper
+
+    async def execute(self, debug: bool = False) -> Any:
+        return await self.pool.execute(self, debug)
+
+class FemscriptPool:
+    def __init__(self, loop: asyncio.AbstractEventLoop, processes: int, *, timeout: float = 5, guild_concurrency: int = 2, guild_cpu_budget: float = 10, budget_window: float = 60, modules_path: str = "./femscript_modules", native_modules: bool = True, script_cache_path: Optional[str] = None, script_cache_size: int = 8 * 1024 * 1024) -> None:
+        self.loop = loop
+        self.processes = processes
+        self.timeout = timeout
+        self.guild_concurrency = guild_concurrency
+        self.guild_cpu_budget = guild_cpu_budget
+        self.budget_window = budget_window
+        self.modules_path = modules_path
+        self.native_modules = native_modules
+        self.script_cache_path = script_cache_path
+        self.script_cache_size = script_cache_size
+
+        self.generation = 0
+        self.workers: list[Worker] = []
+        self.idle: asyncio.Queue[Worker] = asyncio.Queue()
+        self.guilds: dict[str, GuildBudget] = {}
+        self.last_prune = time.monotonic()
+
+        self.executions = 0
+        self.timeouts = 0
+        self.rejections = 0
+
+    def start(self) -> None:
+        for _ in range(self.processes):
+            self.spawn()
+
+    def spawn(self) -> Worker:
+        worker = Worker(self)
+        self.workers.append(worker)
+        self.idle.put_nowait(worker)
+
+        return worker
+
+    def retire(self, worker: Worker) -> None:
+        worker.kill()
+
+        if worker in self.workers:
+            self.workers.remove(worker)
+
+    def release(self, worker: Worker) -> None:
+        if worker.alive and worker.generation == self.generation:
+            return self.idle.put_nowait(worker)
+
+        self.retire(worker)
+        self.spawn()
+
+    def restart(self) -> None:
+        self.generation += 1
+
+        workers = [self.idle.get_nowait() for _ in range(self.idle.qsize())]
+
+        for worker in workers:
+            self.retire(worker)
+
+        for _ in workers:
+            self.spawn()
+
+    def close(self) -> None:
+        for worker in self.workers:
+            worker.kill()
+
+        self.workers.clear()
+
+    def compile(self, code: str, *, variables: list[dict[str, Any]], guild_id: str, ast: Optional[list[AST]] = None) -> RemoteFemscript:
+        return RemoteFemscript(self, code, variables, guild_id, ast)
+
+    def prune(self) -> None:
+        self.last_prune = time.monotonic()
+
+        for guild_id in [guild_id for guild_id, budget in self.guilds.items() if budget.expired(self.budget_window)]:
+            del self.guilds[guild_id]
+
+    def get_budget(self, guild_id: str) -> GuildBudget:
+        if time.monotonic() - self.last_prune >= self.budget_window:
+            self.prune()
+
+        if (budget := self.guilds.get(guild_id)) is None:
+            budget = self.guilds[guild_id] = GuildBudget(asyncio.Semaphore(self.guild_concurrency))
+
+        budget.rollover(self.budget_window)
+
+        return budget
+
+    async def execute(self, femscript: RemoteFemscript, debug: bool = False) -> Any:
+        budget = self.get_budget(femscript.guild_id)
+
+        if budget.cpu_time >= self.guild_cpu_budget:
+            self.rejections += 1
+            raise FemscriptLimitExceeded(f"cpu budget exhausted, try again in {self.budget_window - (time.monotonic() - budget.window_start):.0f}s")
+
+        budget.running += 1
+
+        try:
+            async with budget.semaphore:
+                while not (worker := await self.idle.get()).alive:
+                    self.retire(worker)
+                    self.spawn()
+
+                before = time.monotonic()
+                cpu_time = None
+
+                try:
+                    status, value, cpu_time, femscript.parse_time = await asyncio.wait_for(worker.run(femscript, debug), self.timeout)
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    worker.kill()
+                    raise FemscriptLimitExceeded(f"script exceeded the {self.timeout:g}s time limit")
+                finally:
+                    wall_time = time.monotonic() - before
+                    femscript.cpu_time = cpu_time
+                    budget.charge(wall_time if cpu_time is None else cpu_time, wall_time)
+                    self.executions += 1
+                    self.release(worker)
+        finally:
+            budget.running -= 1
+
+        if status == "error":
+            raise value
+
+        return value
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            "workers": len(self.workers),
+            "idle": self.idle.qsize(),
+            "executions": self.executions,
+            "timeouts": self.timeouts,
+            "rejections": self.rejections
+        }
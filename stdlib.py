@@ -0,0 +1,108 @@
+"""
+Copyright 2022-2025 PoligonTeam
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from femscript import Femscript, FemscriptModules, FemscriptModule
+from dataclasses import dataclass
+
+import inspect, random, math, os, re
+
+from typing import Callable, Any
+
+MODULES_PATH = "./femscript_modules"
+
+FUNCTION_PATTERN = re.compile(r"^\s*fn\s+(\w+)\s*\(", re.MULTILINE)
+
+@dataclass
+class NativeModule:
+    name: str
+    functions: dict[str, Callable[..., Any]]
+
+    def native_name(self, function: str) -> str:
+        return "_" + self.name + "_" + function
+
+    def covers(self, source: str) -> bool:
+        return set(FUNCTION_PATTERN.findall(source)) <= self.functions.keys()
+
+    def source(self) -> str:
+        functions = []
+
+        for name, func in self.functions.items():
+            arguments = ", ".join(inspect.signature(func).parameters)
+            functions.append(f"    fn {name}({arguments}) {{\n        {self.native_name(name)}({arguments})\n    }}")
+
+        return f"{self.name} = {{\n" + "\n\n".join(functions) + "\n};"
+
+    def wrap(self, femscript: Femscript) -> None:
+        for name, func in self.functions.items():
+            femscript.wrap_function(func, func_name=self.native_name(name))
+
+def math_floor(number: float) -> float:
+    return float(math.trunc(number))
+
+def math_round(number: float) -> float:
+    decimal = math.fmod(number, 1)
+    return number + 1 - decimal if decimal > 0.5 else number - decimal
+
+def math_randint(min: float, max: float) -> float:
+    return float(math.trunc(min + (max - min) * random.random()))
+
+def math_random_choice(list: list) -> Any:
+    return list[int(math_randint(0, len(list)))]
+
+def math_5050() -> bool:
+    return 0.5 > random.random()
+
+NATIVE_MODULES = {
+    "math": NativeModule("math", {
+        "randint": math_randint,
+        "random_choice": math_random_choice,
+        "_5050": math_5050,
+        "round": math_round,
+        "floor": math_floor
+    })
+}
+
+def get_native_modules(path: str = MODULES_PATH) -> list[NativeModule]:
+    native_modules = []
+
+    for name, module in NATIVE_MODULES.items():
+        if not os.path.exists(path + "/" + name + ".fem"):
+            native_modules.append(module)
+            continue
+
+        with open(path + "/" + name + ".fem", "r") as file:
+            if module.covers(file.read()):
+                native_modules.append(module)
+
+    return native_modules
+
+def load_modules(modules: FemscriptModules, path: str = MODULES_PATH, native: bool = True) -> list[NativeModule]:
+    native_modules = get_native_modules(path) if native else []
+    native_names = {module.name for module in native_modules}
+
+    for filename in os.listdir(path):
+        if filename[-4:] == ".fem" and filename[:-4] not in native_names:
+            with open(path + "/" + filename, "r") as file:
+                modules.add_module(FemscriptModule(filename[:-4], file.read()))
+
+    for module in native_modules:
+        modules.add_module(FemscriptModule(module.name, module.source()))
+
+    return native_modules
+
+def wrap_native_modules(femscript: Femscript, native_modules: list[NativeModule]) -> None:
+    for module in native_modules:
+        module.wrap(femscript)
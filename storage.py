@@ -0,0 +1,269 @@
+"""
+Copyright 2022-2025 PoligonTeam
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from tortoise.transactions import in_transaction
+from tortoise.backends.base.client import BaseDBAsyncClient
+from models import GuildDatabase
+from collections import OrderedDict
+
+import asyncio
+
+from typing import Iterable, AbstractSet, Any, Optional
+
+MISSING = object()
+
+class GuildStorage:
+    def __init__(self, guild_id: str) -> None:
+        self.guild_id = guild_id
+
+        self.values: dict[str, Any] = {}
+        self.missing: set[str] = set()
+        self.complete = False
+
+        self.dirty: set[str] = set()
+        self.removed: set[str] = set()
+
+    def __repr__(self) -> str:
+        return "<GuildStorage guild_id={!r} keys={!r} dirty={!r} removed={!r}>".format(self.guild_id, len(self.values), len(self.dirty), len(self.removed))
+
+    @property
+    def is_dirty(self) -> bool:
+        return bool(self.dirty or self.removed)
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        if key in self.values:
+            return self.values[key]
+
+        if self.complete or key in self.missing:
+            return default
+
+        row = await GuildDatabase.filter(guild_id=self.guild_id, key=key).only("value").first()
+
+        if key in self.values or key in self.missing:
+            return self.values.get(key, default)
+
+        if row is None:
+            self.missing.add(key)
+            return default
+
+        self.values[key] = row.value
+
+        return row.value
+
+    async def get_many(self, keys: Iterable[str]) -> dict[str, Any]:
+        if not self.complete:
+            if unknown := [key for key in keys if key not in self.values and key not in self.missing]:
+                rows = dict(await GuildDatabase.filter(guild_id=self.guild_id, key__in=unknown).values_list("key", "value"))
+
+                for key in unknown:
+                    if key in self.values or key in self.missing:
+                        continue
+
+                    if key in rows:
+                        self.values[key] = rows[key]
+                    else:
+                        self.missing.add(key)
+
+        return {key: self.values[key] for key in keys if key in self.values}
+
+    async def get_all(self) -> dict[str, Any]:
+        if not self.complete:
+            for key, value in await GuildDatabase.filter(guild_id=self.guild_id).values_list("key", "value"):
+                if key not in self.values and key not in self.missing:
+                    self.values[key] = value
+
+            self.missing.clear()
+            self.complete = True
+
+        return self.values
+
+    def set(self, key: str, value: Any) -> Any:
+        self.values[key] = value
+        self.missing.discard(key)
+        self.removed.discard(key)
+        self.dirty.add(key)
+
+        return value
+
+    async def remove(self, key: str) -> Any:
+        if (value := await self.get(key, MISSING)) is MISSING:
+            raise KeyError(key)
+
+        del self.values[key]
+        self.missing.add(key)
+        self.dirty.discard(key)
+        self.removed.add(key)
+
+        return value
+
+    def pop_changes(self) -> tuple[dict[str, Any], AbstractSet[str]]:
+        changes = {key: self.values[key] for key in self.dirty}, self.removed
+        self.dirty, self.removed = set(), set()
+
+        return changes
+
+    def merge(self, other: "GuildStorage") -> None:
+        changes, removed = other.pop_changes()
+
+        for key, value in changes.items():
+            self.set(key, value)
+
+        for key in removed - changes.keys():
+            self.values.pop(key, None)
+            self.missing.add(key)
+            self.dirty.discard(key)
+            self.removed.add(key)
+
+    def restore_changes(self, changes: dict[str, Any], removed: AbstractSet[str]) -> None:
+        self.dirty |= changes.keys() - self.removed
+        self.removed |= removed - self.dirty
+
+    async def write_changes(self, changes: dict[str, Any], removed: AbstractSet[str], connection: BaseDBAsyncClient) -> None:
+        if changes:
+            await GuildDatabase.bulk_create(
+                [GuildDatabase(guild_id=self.guild_id, key=key, value=value) for key, value in changes.items()],
+                on_conflict = ("guild_id", "key"),
+                update_fields = ("value",),
+                using_db = connection
+            )
+
+        if removed:
+            await GuildDatabase.filter(guild_id=self.guild_id, key__in=removed).using_db(connection).delete()
+
+    async def flush(self) -> None:
+        if not self.is_dirty:
+            return
+
+        changes, removed = self.pop_changes()
+
+        try:
+            async with in_transaction() as connection:
+                await self.write_changes(changes, removed, connection)
+        except Exception:
+            self.restore_changes(changes, removed)
+            raise
+
+    @staticmethod
+    async def clear(guild_id: str) -> None:
+        await GuildDatabase.filter(guild_id=guild_id).delete()
+
+class StorageBuffer:
+    def __init__(self, loop: asyncio.AbstractEventLoop, *, flush_interval: float = 0.5, max_writes: int = 100, max_guilds: int = 1000) -> None:
+        self.loop = loop
+        self.flush_interval = flush_interval
+        self.max_writes = max_writes
+        self.max_guilds = max_guilds
+
+        self.storages: OrderedDict[str, GuildStorage] = OrderedDict()
+        self.pending: set[str] = set()
+        self.writes = 0
+
+        self.handle: Optional[asyncio.TimerHandle] = None
+        self.flush_task: Optional[asyncio.Task] = None
+        self.lock = asyncio.Lock()
+
+        self.flushes = 0
+        self.flushed_writes = 0
+
+    def get(self, guild_id: str) -> GuildStorage:
+        if (storage := self.storages.get(guild_id)) is not None:
+            self.storages.move_to_end(guild_id)
+            return storage
+
+        storage = self.storages[guild_id] = GuildStorage(guild_id)
+
+        if len(self.storages) > self.max_guilds:
+            for evicted_id in [key for key in self.storages if key not in self.pending and not self.storages[key].is_dirty][:len(self.storages) - self.max_guilds]:
+                del self.storages[evicted_id]
+
+        return storage
+
+    def register(self, storage: GuildStorage) -> None:
+        if (current := self.storages.get(storage.guild_id)) is None:
+            self.storages[storage.guild_id] = storage
+        elif current is not storage:
+            current.merge(storage)
+
+    def commit(self, storage: GuildStorage) -> None:
+        if not storage.is_dirty:
+            return
+
+        self.register(storage)
+        self.pending.add(storage.guild_id)
+        self.writes += 1
+
+        if self.writes >= self.max_writes:
+            self.schedule_flush(0)
+        elif self.handle is None:
+            self.schedule_flush(self.flush_interval)
+
+    def schedule_flush(self, delay: float) -> None:
+        if self.handle is not None:
+            self.handle.cancel()
+
+        self.handle = self.loop.call_later(delay, self.start_flush)
+
+    def start_flush(self) -> None:
+        self.handle = None
+
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = self.loop.create_task(self.flush())
+
+    async def flush(self) -> None:
+        async with self.lock:
+            if not self.pending:
+                return
+
+            pending, writes = self.pending, self.writes
+            self.pending, self.writes = set(), 0
+
+            changes = [(storage, *storage.pop_changes()) for guild_id in pending if (storage := self.storages.get(guild_id)) is not None]
+
+            try:
+                async with in_transaction() as connection:
+                    for storage, values, removed in changes:
+                        await storage.write_changes(values, removed, connection)
+            except Exception as exc:
+                for storage, values, removed in changes:
+                    storage.restore_changes(values, removed)
+                    self.register(storage)
+
+                self.pending |= pending
+                self.writes += writes
+
+                print(f"failed to flush guild databases: {exc!r}")
+            else:
+                self.flushes += 1
+                self.flushed_writes += writes
+
+        if self.pending and self.handle is None:
+            self.schedule_flush(self.flush_interval)
+
+    async def clear(self, guild_id: str) -> None:
+        self.storages.pop(guild_id, None)
+        self.pending.discard(guild_id)
+
+        await GuildStorage.clear(guild_id)
+
+    async def close(self) -> None:
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+
+        if self.flush_task is not None and not self.flush_task.done():
+            await self.flush_task
+
+        await self.flush()
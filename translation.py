@@ -0,0 +1,120 @@
+"""
+Copyright 2022-2025 PoligonTeam
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import femcord.femcord as femcord
+from femscript import Femscript, AST
+
+import copy, os
+
+from typing import Any
+
+TRANSLATIONS_PATH = "./cogs/translations"
+
+def token(type: str, value: str = "") -> dict[str, Any]:
+    return {
+        "type": type,
+        "value": value,
+        "number": 0.0,
+        "list": [],
+        "bytes": b""
+    }
+
+def build_call(name: str, argc: int) -> AST:
+    return {
+        "type": "Keyword",
+        "token": token("Return"),
+        "children": [
+            {
+                "type": "Token",
+                "token": token("Var", name),
+                "children": [
+                    {
+                        "type": "Token",
+                        "token": token("List"),
+                        "children": [
+                            {
+                                "type": "Token",
+                                "token": token("Var", "arg%d" % index),
+                                "children": []
+                            }
+                            for index in range(argc)
+                        ]
+                    }
+                ]
+            }
+        ]
+    }
+
+def get_arity(ast: AST) -> int:
+    for node in ast["children"][0]["children"]:
+        if node["token"]["type"] == "List":
+            return len(node["children"] or node["token"]["list"])
+
+    return 0
+
+def fork(femscript: Femscript) -> Femscript:
+    forked = copy.copy(femscript)
+
+    for name, value in vars(femscript).items():
+        if name != "ast" and isinstance(value, (list, dict, set)):
+            setattr(forked, name, copy.copy(value))
+
+    return forked
+
+class Translation:
+    def __init__(self, name: str, ast: AST, argc: int = 0) -> None:
+        self.name = name
+        self.ast = ast
+        self.templates: dict[int, Femscript] = {}
+
+        self.template(argc)
+
+    def __repr__(self) -> str:
+        return "<Translation name={!r}>".format(self.name)
+
+    def template(self, argc: int) -> Femscript:
+        if (template := self.templates.get(argc)) is None:
+            template = self.templates[argc] = Femscript()
+            template.ast = [self.ast, build_call(self.name, argc)]
+            template.wrap_function(femcord.Embed)
+
+        return template
+
+    async def __call__(self, *args: Any) -> str | femcord.Embed:
+        femscript = fork(self.template(len(args)))
+        femscript.variables = [
+            {
+                "name": "arg%d" % index,
+                "value": Femscript.to_fs(value)
+            }
+            for index, value in enumerate(args)
+        ]
+
+        return await femscript.execute()
+
+def parse_translations(content: str) -> list[tuple[str, int, AST]]:
+    return [(ast["children"][0]["token"]["value"], get_arity(ast), ast) for ast in Femscript(content).ast]
+
+def load_translations(name: str, path: str = TRANSLATIONS_PATH) -> dict[str, dict[str, Translation]]:
+    translations = {}
+
+    for filename in os.listdir(path + "/" + name):
+        lang, _ = filename.split(".")
+
+        with open(path + "/" + name + "/" + filename) as file:
+            translations[lang] = {translation: Translation(translation, ast, argc) for translation, argc, ast in parse_translations(file.read())}
+
+    return translations
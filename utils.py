@@ -18,25 +18,36 @@ from femcord import femcord
 from femcord.femcord import types
 from femcord.femcord.enums import ChannelTypes
 from femscript import Femscript, var, parse_equation, format_string, FemscriptException, Token
-from aiohttp import ClientSession, ClientTimeout, ClientHttpProxyError
-from models import Artists, LastFM, Lyrics
+from aiohttp import ClientSession
+from tortoise import timezone
+from models import Artists, LastFM, Lyrics, normalize_track
+from storage import GuildStorage
+from http_client import ScriptHTTPClient
+from cache import LRUCache, MISSING, select_attributes
 from config import LASTFM_API_URL, LASTFM_API_KEY
 from lastfm import Client, Track, exceptions
 from lyrics import GeniusClient, MusixmatchClient, TrackNotFound, LyricsNotFound, Lyrics as LyricsTrack
 
 import asyncio
 import base64
+import contextvars
+import functools
 import config
 import random
 import io
-import inspect
 import json
 import math
 import re
 import struct
 import operator
 
-from typing import Any, Optional, Awaitable, NotRequired, TypedDict
+from dataclasses import dataclass
+from datetime import timedelta
+
+from typing import Any, Callable, Optional, Awaitable, NotRequired, TypedDict, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from bot import Bot, Context, AppContext
 
 class fg:
     black = "\u001b[30m"
@@ -200,215 +211,341 @@ async def update_lastfm_avatars():
     for user in await users:
         asyncio.create_task(get_lastfm_avatar(user))
 
-async def get_artist_image(artist: str):
-    artist_db = await Artists.filter(artist=artist).first()
+DEFAULT_ARTIST_IMAGE = "https://www.last.fm/static/images/marvin.05ccf89325af.png"
 
-    if artist_db:
-        return artist_db.image
+ARTIST_IMAGES = LRUCache(2048, ttl=3600)
+ARTIST_IMAGE_FETCHES: dict[str, asyncio.Future[Optional[str]]] = {}
+ARTIST_NOT_FOUND_TTL = timedelta(days=1)
+ARTIST_IMAGE_MAX_AGE = timedelta(days=30)
 
+async def fetch_artist_image(artist: str) -> Optional[str]:
     async with Client() as client:
         try:
             image = await client.artist_image(artist)
         except exceptions.NotFound:
-            return "https://www.last.fm/static/images/marvin.05ccf89325af.png"
+            image = None
+
+    await Artists.bulk_create([Artists(artist=artist, image=image)], on_conflict=("artist",), update_fields=("image", "updated_at"))
+
+    return image
+
+async def load_artist_image(artist: str) -> Optional[str]:
+    artist_db = await Artists.filter(artist=artist).only("id", "image", "updated_at").first()
+
+    if artist_db is not None and (artist_db.image is not None or timezone.now() - artist_db.updated_at < ARTIST_NOT_FOUND_TTL):
+        return artist_db.image
+
+    return await fetch_artist_image(artist)
+
+async def get_artist_image(artist: str) -> str:
+    if (image := ARTIST_IMAGES.get(artist, MISSING)) is MISSING:
+        if (future := ARTIST_IMAGE_FETCHES.get(artist)) is None:
+            future = ARTIST_IMAGE_FETCHES[artist] = asyncio.ensure_future(load_artist_image(artist))
+            future.add_done_callback(lambda _: ARTIST_IMAGE_FETCHES.pop(artist, None))
+
+        image = ARTIST_IMAGES.set(artist, await asyncio.shield(future))
+
+    return image or DEFAULT_ARTIST_IMAGE
 
-        await Artists.create(artist=artist, image=image)
+async def refresh_artist_images(limit: int = 50) -> None:
+    artists = await Artists.filter(updated_at__lt=timezone.now() - ARTIST_IMAGE_MAX_AGE).order_by("updated_at").limit(limit).values_list("artist", flat=True)
 
-    return await get_artist_image(artist)
+    for artist in artists:
+        try:
+            image = await fetch_artist_image(artist)
+        except Exception as exc:
+            print(f"failed to refresh artist image for {artist!r}: {exc!r}")
+            continue
+
+        if artist in ARTIST_IMAGES:
+            ARTIST_IMAGES.set(artist, image)
+
+LYRICS_CACHE = LRUCache(256)
+LYRICS_NOT_FOUND_TTL = timedelta(days=3)
+
+async def get_track_lyrics(artist: str, title: str, session: ClientSession) -> Optional[Lyrics]:
+    lookup_key = normalize_track(artist, title)
+
+    if (lyrics_db := LYRICS_CACHE.get(lookup_key, MISSING)) is MISSING:
+        lyrics_db = await Lyrics.filter(lookup_key=lookup_key).first()
 
-async def get_track_lyrics(artist: str, title: str, session: ClientSession):
-    lyrics_db = await Lyrics.get_or_none(title__icontains=title)
+    if lyrics_db is not None and (lyrics_db.found or timezone.now() - lyrics_db.updated_at < LYRICS_NOT_FOUND_TTL):
+        LYRICS_CACHE.set(lookup_key, lyrics_db)
+        return lyrics_db if lyrics_db.found else None
 
-    if lyrics_db is None:
-        name = artist + " " + title
-        track = LyricsTrack(artist, title)
+    name = artist + " " + title
+    track = LyricsTrack(artist, title)
+    source = None
 
-        async with MusixmatchClient(config.MUSIXMATCH, session) as musixmatch:
+    async with MusixmatchClient(config.MUSIXMATCH, session) as musixmatch:
+        try:
+            track = await musixmatch.get_lyrics(name)
+            source = "Musixmatch"
+        except (TrackNotFound, LyricsNotFound):
+            pass
+
+    if track.lyrics is None:
+        async with GeniusClient(config.GENIUS, session) as genius:
             try:
-                track = await musixmatch.get_lyrics(name)
-                source = "Musixmatch"
+                track = await genius.get_lyrics(name)
+                source = "Genius"
             except (TrackNotFound, LyricsNotFound):
                 pass
 
-        if track.lyrics is None:
-            async with GeniusClient(config.GENIUS, session) as genius:
-                try:
-                    track = await genius.get_lyrics(name)
-                    source = "Genius"
-                except (TrackNotFound, LyricsNotFound):
-                    return None
-
-        lyrics_db = await Lyrics.get_or_none(title__icontains=track.title)
-
-        if lyrics_db is None:
-            lyrics_db = Lyrics(artist=track.artist, title=track.title, source=source, lyrics=track.lyrics)
-            await lyrics_db.save()
-
-    return lyrics_db
-
-def convert(**items):
-    objects = {
-        types.Guild: lambda guild: dict(
-            id = guild.id,
-            name = guild.name,
-            description = guild.description,
-            icon_url = guild.icon_url,
-            banner_url = guild.banner_url,
-            owner = dict(
-                id = guild.owner.user.id,
-                username = guild.owner.user.username,
-                avatar_url = guild.owner.user.avatar_url,
-                bot = guild.owner.user.bot
-            ),
-            members = len(guild.members),
-            channels = [channel_convert(channel) for channel in guild.channels],
-            roles = [role_convert(role) for role in guild.roles],
-            emojis = [emoji_convert(emoji) for emoji in guild.emojis],
-            stickers = [sticker_convert(sticker) for sticker in guild.stickers]
-        ),
-        types.User: lambda user: dict(
-            id = user.id,
-            username = user.username,
-            avatar_url = user.avatar_url,
-            bot = user.bot,
-            primary_guild = dict(
-                identity_guild_id = user.primary_guild.identity_guild_id,
-                tag = user.primary_guild.tag,
-                badge_url = user.primary_guild.badge_url
-            ) if user.primary_guild else None
-        ),
-        types.Member: lambda member: dict(
-            nick = member.nick,
-            roles = [role_convert(role) for role in member.roles],
-            permissions = [permission.name for permission in member.permissions.permissions]
-        ),
-        types.Channel: (channel_convert := lambda channel: dict(
-            type = channel.type.name if channel.type else ChannelTypes.DM.name,
-            id = channel.id,
-            name = channel.name,
-            topic = channel.topic,
-            nsfw = channel.nsfw,
-            position = channel.position
-        )),
-        types.Role: (role_convert := lambda role: dict(
-            id = role.id,
-            name = role.name,
-            color = role.color,
-            hoist = role.hoist,
-            mentionable = role.mentionable,
-            position = role.position
-        )),
-        types.Emoji: (emoji_convert := lambda emoji: dict(
-            id = emoji.id,
-            name = emoji.name,
-            animated = emoji.animated,
-            url = emoji.url
-        )),
-        types.Sticker: (sticker_convert := lambda sticker: dict(
-            id = sticker.id,
-            name = sticker.name,
-            type = sticker.type.name,
-            format_type = sticker.format_type.name,
-            url = sticker.url
-        )),
-        types.Interaction: lambda interaction: dict(
-            message = dict(id=interaction.message.id),
-            data = dict(values=interaction.data.values)
+    lyrics_db = Lyrics(
+        lookup_key = lookup_key,
+        artist = track.artist,
+        title = track.title,
+        source = source,
+        content = Lyrics.compress(track.lyrics) if track.lyrics is not None else None,
+        found = track.lyrics is not None,
+        updated_at = timezone.now()
+    )
+
+    await Lyrics.bulk_create([lyrics_db], on_conflict=("lookup_key",), update_fields=("artist", "title", "source", "content", "found", "updated_at"))
+
+    LYRICS_CACHE.set(lookup_key, lyrics_db)
+
+    return lyrics_db if lyrics_db.found else None
+
+def lazy_fields(selected: Optional[set[str]], **fields: Callable[[], Any]) -> dict[str, Any]:
+    return {key: field() for key, field in fields.items() if selected is None or key in selected}
+
+@dataclass
+class GuildSnapshot:
+    guild: types.Guild
+    base: Optional[dict[str, Any]] = None
+    channels: Optional[list[dict[str, Any]]] = None
+    roles: Optional[list[dict[str, Any]]] = None
+    emojis: Optional[list[dict[str, Any]]] = None
+    stickers: Optional[list[dict[str, Any]]] = None
+
+    def get(self, part: str, build: Callable[[], Any]) -> Any:
+        if (value := getattr(self, part)) is None:
+            value = build()
+            setattr(self, part, value)
+
+        return value
+
+GUILD_SNAPSHOTS: dict[str, GuildSnapshot] = {}
+
+def get_guild_snapshot(guild: types.Guild) -> GuildSnapshot:
+    if (snapshot := GUILD_SNAPSHOTS.get(guild.id)) is None or snapshot.guild is not guild:
+        snapshot = GUILD_SNAPSHOTS[guild.id] = GuildSnapshot(guild)
+
+    return snapshot
+
+def invalidate_guild(guild_id: str, *parts: str) -> None:
+    if not parts:
+        GUILD_SNAPSHOTS.pop(guild_id, None)
+        return
+
+    if (snapshot := GUILD_SNAPSHOTS.get(guild_id)) is not None:
+        for part in parts:
+            setattr(snapshot, part, None)
+
+def convert_guild(guild: types.Guild, selected: Optional[set[str]] = None) -> dict[str, Any]:
+    snapshot = get_guild_snapshot(guild)
+
+    return snapshot.get("base", lambda: dict(
+        id = guild.id,
+        name = guild.name,
+        description = guild.description,
+        icon_url = guild.icon_url,
+        banner_url = guild.banner_url
+    )) | dict(
+        owner = dict(
+            id = guild.owner.user.id,
+            username = guild.owner.user.username,
+            avatar_url = guild.owner.user.avatar_url,
+            bot = guild.owner.user.bot
         ),
-        Track: lambda track: dict(
-            artist = dict(
-                name = track.artist.name,
-                url = track.artist.url,
-                image = [
-                    dict(
-                        url = image.url,
-                        size = image.size
-                    ) for image in track.artist.image
-                ],
-                streamable = track.artist.streamable,
-                on_tour = track.artist.on_tour,
-                stats = dict(
-                    listeners = track.artist.stats.listeners,
-                    playcount = track.artist.stats.playcount,
-                    userplaycount = track.artist.stats.userplaycount
-                ),
-                similar = [
-                    dict(
-                        name = similar.name,
-                        url = similar.url,
-                        image = [
-                            dict(
-                                url = image.url,
-                                size = image.size
-                            ) for image in similar.image
-                        ]
-                    ) for similar in track.artist.similar
-                ],
-                tags = [
-                    dict(
-                        name = tag.name,
-                        url = tag.url
-                    ) for tag in track.artist.tags
-                ],
-                bio = dict(
-                    links = dict(
-                        name = track.artist.bio.links.name,
-                        rel = track.artist.bio.links.rel,
-                        url = track.artist.bio.links.url
-                    ),
-                    published = track.artist.bio.published,
-                    summary = track.artist.bio.summary,
-                    content = track.artist.bio.content
-                )
-            ),
+        members = len(guild.members)
+    ) | lazy_fields(selected,
+        channels = lambda: snapshot.get("channels", lambda: [convert_channel(channel) for channel in guild.channels]),
+        roles = lambda: snapshot.get("roles", lambda: [convert_role(role) for role in guild.roles]),
+        emojis = lambda: snapshot.get("emojis", lambda: [convert_emoji(emoji) for emoji in guild.emojis]),
+        stickers = lambda: snapshot.get("stickers", lambda: [convert_sticker(sticker) for sticker in guild.stickers])
+    )
+
+def convert_user(user: types.User) -> dict[str, Any]:
+    return dict(
+        id = user.id,
+        username = user.username,
+        avatar_url = user.avatar_url,
+        bot = user.bot,
+        primary_guild = dict(
+            identity_guild_id = user.primary_guild.identity_guild_id,
+            tag = user.primary_guild.tag,
+            badge_url = user.primary_guild.badge_url
+        ) if user.primary_guild else None
+    )
+
+def convert_member(member: types.Member, selected: Optional[set[str]] = None) -> dict[str, Any]:
+    return dict(
+        nick = member.nick
+    ) | lazy_fields(selected,
+        roles = lambda: [convert_role(role) for role in member.roles],
+        permissions = lambda: [permission.name for permission in member.permissions.permissions]
+    )
+
+def convert_channel(channel: types.Channel) -> dict[str, Any]:
+    return dict(
+        type = channel.type.name if channel.type else ChannelTypes.DM.name,
+        id = channel.id,
+        name = channel.name,
+        topic = channel.topic,
+        nsfw = channel.nsfw,
+        position = channel.position
+    )
+
+def convert_role(role: types.Role) -> dict[str, Any]:
+    return dict(
+        id = role.id,
+        name = role.name,
+        color = role.color,
+        hoist = role.hoist,
+        mentionable = role.mentionable,
+        position = role.position
+    )
+
+def convert_emoji(emoji: types.Emoji) -> dict[str, Any]:
+    return dict(
+        id = emoji.id,
+        name = emoji.name,
+        animated = emoji.animated,
+        url = emoji.url
+    )
+
+def convert_sticker(sticker: types.Sticker) -> dict[str, Any]:
+    return dict(
+        id = sticker.id,
+        name = sticker.name,
+        type = sticker.type.name,
+        format_type = sticker.format_type.name,
+        url = sticker.url
+    )
+
+def convert_interaction(interaction: types.Interaction) -> dict[str, Any]:
+    return dict(
+        message = dict(id=interaction.message.id),
+        data = dict(values=interaction.data.values)
+    )
+
+def convert_track(track: Track) -> dict[str, Any]:
+    return dict(
+        artist = dict(
+            name = track.artist.name,
+            url = track.artist.url,
             image = [
                 dict(
                     url = image.url,
                     size = image.size
-                ) for image in track.image
-            ] if track.image else [],
-            album = dict(
-                name = track.album.name,
-                mbid = track.album.mbid,
-                image = [
-                    dict(
-                        url = image.url,
-                        size = image.size
-                    ) for image in track.image
-                ] if track.image else [],
-                position = track.album.position
-            ) if track.album else None,
-            title = track.title,
-            url = track.url,
-            date = dict(
-                uts = track.date.uts,
-                text = track.date.text,
-                date = track.date.date
-            ) if track.date else None,
-            listeners = track.listeners,
-            playcount = track.playcount,
-            scrobbles = track.scrobbles or "0",
+                ) for image in track.artist.image
+            ],
+            streamable = track.artist.streamable,
+            on_tour = track.artist.on_tour,
+            stats = dict(
+                listeners = track.artist.stats.listeners,
+                playcount = track.artist.stats.playcount,
+                userplaycount = track.artist.stats.userplaycount
+            ),
+            similar = [
+                dict(
+                    name = similar.name,
+                    url = similar.url,
+                    image = [
+                        dict(
+                            url = image.url,
+                            size = image.size
+                        ) for image in similar.image
+                    ]
+                ) for similar in track.artist.similar
+            ],
             tags = [
                 dict(
                     name = tag.name,
                     url = tag.url
-                ) for tag in track.tags
+                ) for tag in track.artist.tags
             ],
-            streamable = track.streamable,
-            duration = track.duration,
-            mbid = track.mbid,
-            loved = track.loved,
-            userloved = track.userloved
-        )
-    }
+            bio = dict(
+                links = dict(
+                    name = track.artist.bio.links.name,
+                    rel = track.artist.bio.links.rel,
+                    url = track.artist.bio.links.url
+                ),
+                published = track.artist.bio.published,
+                summary = track.artist.bio.summary,
+                content = track.artist.bio.content
+            )
+        ),
+        image = [
+            dict(
+                url = image.url,
+                size = image.size
+            ) for image in track.image
+        ] if track.image else [],
+        album = dict(
+            name = track.album.name,
+            mbid = track.album.mbid,
+            image = [
+                dict(
+                    url = image.url,
+                    size = image.size
+                ) for image in track.image
+            ] if track.image else [],
+            position = track.album.position
+        ) if track.album else None,
+        title = track.title,
+        url = track.url,
+        date = dict(
+            uts = track.date.uts,
+            text = track.date.text,
+            date = track.date.date
+        ) if track.date else None,
+        listeners = track.listeners,
+        playcount = track.playcount,
+        scrobbles = track.scrobbles or "0",
+        tags = [
+            dict(
+                name = tag.name,
+                url = tag.url
+            ) for tag in track.tags
+        ],
+        streamable = track.streamable,
+        duration = track.duration,
+        mbid = track.mbid,
+        loved = track.loved,
+        userloved = track.userloved
+    )
+
+CONVERTERS: dict[type, Callable[[Any], dict[str, Any]]] = {
+    types.Guild: convert_guild,
+    types.User: convert_user,
+    types.Member: convert_member,
+    types.Channel: convert_channel,
+    types.Role: convert_role,
+    types.Emoji: convert_emoji,
+    types.Sticker: convert_sticker,
+    types.Interaction: convert_interaction,
+    Track: convert_track
+}
+
+PARTIAL_CONVERTERS = (types.Guild, types.Member)
 
+def convert(references: Optional[frozenset[str]] = None, **items):
     converted = {}
 
     for key, value in items.items():
-        if (_type := type(value)) in objects:
-            converted[key] = objects[type(value)](value)
+        if (selected := select_attributes(references, key)) is False:
+            continue
+
+        if (_type := type(value)) in PARTIAL_CONVERTERS:
+            converted[key] = CONVERTERS[_type](value, selected)
+        elif _type in CONVERTERS:
+            converted[key] = CONVERTERS[_type](value)
         elif _type is list:
-            converted[key] = [objects[type(item)](item) for item in value]
+            converted[key] = [CONVERTERS[type(item)](item) for item in value]
 
     return converted
 
@@ -447,36 +584,16 @@ def table(names, rows):
 
     return text
 
-async def request(method: str, url: str, *, headers: Optional[dict] = None, cookies: Optional[dict] = None, data: Optional[dict] = None):
-    async with ClientSession(timeout=ClientTimeout(10)) as session:
-        try:
-            async with session.request(method, url, headers={"User-Agent": "femscript/1.0"} | (headers or {}), cookies=cookies, json=data, proxy=config.PROXY) as response:
-                length = response.content_length
-
-                if length is not None and length > 10 * 1024 * 1024:
-                    return {
-                        "status": -1,
-                        "text": "Content too large",
-                        "json": {}
-                    }
-
-                content = await response.read()
-
-                data = {}
-
-                if response.content_type == "application/json":
-                    try:
-                        data = json.loads(content)
-                    except json.JSONDecodeError:
-                        data = {}
-
-                return {
-                    "status": response.status,
-                    "text": content.decode(response.get_encoding()),
-                    "json": data
-                }
-        except ClientHttpProxyError as exc:
-            raise FemscriptException(f"ClientHttpProxyError: {exc.status}")
+http_client = ScriptHTTPClient(rate=config.REQUEST_RATE_LIMIT, period=config.REQUEST_RATE_PERIOD, proxy=config.PROXY)
+
+async def request(method: str, url: str, *, headers: Optional[dict] = None, cookies: Optional[dict] = None, data: Optional[dict] = None, cache: float = 0):
+    return await http_client.request(method, url, headers=headers, cookies=cookies, data=data, cache=cache)
+
+def request_for(bucket: str) -> Callable[..., Awaitable[dict]]:
+    async def request(method: str, url: str, *, headers: Optional[dict] = None, cookies: Optional[dict] = None, data: Optional[dict] = None, cache: float = 0):
+        return await http_client.request(method, url, headers=headers, cookies=cookies, data=data, cache=cache, bucket=bucket)
+
+    return request
 
 token_specification = [
     ("COMMENT",     r"#.*"),
@@ -616,6 +733,23 @@ def wrap_builtins(femscript: Femscript) -> None:
     femscript.wrap_function(femcord.Separator)
     femscript.wrap_function(femcord.Container)
 
+def wrap_database(femscript: Femscript, storage: GuildStorage) -> None:
+    @femscript.wrap_function()
+    async def get_all() -> dict[str, object]:
+        return await storage.get_all()
+
+    @femscript.wrap_function()
+    async def get_value(key: str) -> Any:
+        return await storage.get(key)
+
+    @femscript.wrap_function()
+    def update[T](key: str, value: T) -> T:
+        return storage.set(key, value)
+
+    @femscript.wrap_function()
+    async def remove(key: str) -> Any:
+        return await storage.remove(key)
+
 def fn1va(text: str) -> int:
     offset = 0x811c9dc5
     prime = 0x1000193
@@ -629,26 +763,32 @@ def fn1va(text: str) -> int:
 
     return offset
 
-def _(*args: Any, **kwargs: Any) -> str | Awaitable:
-    last_frame = inspect.currentframe().f_back
-    _vars = last_frame.f_globals | last_frame.f_locals
-    if "self" in _vars:
-        bot = _vars["self"].bot
-    else:
-        bot = _vars["bot"]
-    ctx = _vars["ctx"]
+translation_context: contextvars.ContextVar[Optional["Context | AppContext | TranslationContext"]] = contextvars.ContextVar("translation_context", default=None)
+
+@functools.cache
+def get_hash(text: str) -> int:
+    return fn1va(text)
+
+@dataclass
+class TranslationContext:
+    bot: "Bot"
+    guild: Optional[types.Guild]
+
+def set_translation_context(ctx: "Context | AppContext | TranslationContext") -> None:
+    translation_context.set(ctx)
 
-    if len(args) > 1 or kwargs:
-        return format_string(_(args[0]), *args[1:], **kwargs)
+def _(text: str, *args: Any, **kwargs: Any) -> str | Awaitable:
+    if args or kwargs:
+        return format_string(_(text), *args, **kwargs)
 
-    _hash = fn1va(args[0])
+    ctx = translation_context.get()
 
-    language = ctx.guild.language if ctx.guild else "en"
+    if ctx is None:
+        return text
 
-    if language not in bot.translations:
-        return args[0]
+    language = ctx.bot.guild_settings.get(ctx.guild.id).language if ctx.guild else "en"
 
-    if _hash not in bot.translations[language]:
-        return args[0]
+    if language not in ctx.bot.translations:
+        return text
 
-    return bot.translations[language][_hash]
\ No newline at end of file
+    return ctx.bot.translations[language].get(get_hash(text), text)